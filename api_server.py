@@ -16,7 +16,7 @@ import logging
 from dataclasses import asdict
 from config import config
 from logging_config import get_logger
-from storage_manager import storage_manager
+from storage_manager import storage_manager, exit_on_sigterm
 from data_models import Agent, Delegation, TokenInfo, SystemActivity, AgentStatus, DelegationStatus
 
 # Initialize Flask app
@@ -480,6 +480,9 @@ def main():
     logger.info(f"Starting API Server on port {config.frontend_port}")
     logger.info(f"CORS origins: {cors_origins}")
     
+    # Exit cleanly on SIGTERM so pending storage writes are flushed
+    exit_on_sigterm()
+    
     app.run(
         host="0.0.0.0",
         port=config.frontend_port,
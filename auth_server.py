@@ -11,7 +11,7 @@ import hashlib
 import base64
 from config import config
 from logging_config import get_logger
-from storage_manager import storage_manager
+from storage_manager import storage_manager, exit_on_sigterm
 from data_models import Agent, AgentStatus
 
 app = Flask(__name__)
@@ -346,12 +346,11 @@ def internal_error(error):
 
 def main():
     """Main entry point for the authorization server."""
-    from config import config
-    from logging_config import get_logger
-    
-    logger = get_logger('auth_server')
     logger.info(f"Starting Authorization Server on port {config.auth_server_port}")
     
+    # Exit cleanly on SIGTERM so pending storage writes are flushed
+    exit_on_sigterm()
+    
     app.run(
         host=config.auth_server_host,
         port=config.auth_server_port,
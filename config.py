@@ -24,6 +24,9 @@ class Config:
     # File Storage
     agents_file: str = os.environ.get("AGENTS_FILE", "agents.json")
     users_file: str = os.environ.get("USERS_FILE", "users.json")
+    delegations_file: str = os.environ.get("DELEGATIONS_FILE", "delegations.json")
+    tokens_file: str = os.environ.get("TOKENS_FILE", "tokens.json")
+    activities_file: str = os.environ.get("ACTIVITIES_FILE", "activities.jsonl")
     
     # Server Configuration
     auth_server_host: str = os.environ.get("AUTH_SERVER_HOST", "localhost")
@@ -31,6 +34,7 @@ class Config:
     resource_server_host: str = os.environ.get("RESOURCE_SERVER_HOST", "localhost")
     resource_server_port: int = int(os.environ.get("RESOURCE_SERVER_PORT", "6000"))
     frontend_port: int = int(os.environ.get("FRONTEND_PORT", "7000"))
+    server_threads: int = int(os.environ.get("SERVER_THREADS", "8"))
     
     # Keycloak Integration
     keycloak_url: Optional[str] = os.environ.get("KEYCLOAK_URL")
@@ -35,7 +35,7 @@ class TokenType(Enum):
     ACCESS = "access"
 
 
-@dataclass
+@dataclass(slots=True)
 class Agent:
     """Enhanced Agent data model with validation and lifecycle management."""
     id: str
@@ -88,7 +88,7 @@ class Agent:
         return cls(**data)
 
 
-@dataclass
+@dataclass(slots=True)
 class Delegation:
     """Enhanced Delegation data model with token lifecycle management."""
     id: str
@@ -313,7 +313,7 @@ class TokenInfo:
         return asdict(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class SystemActivity:
     """System activity log entry."""
     id: str
@@ -1,6 +1,8 @@
 from flask import Flask, render_template_string, jsonify
 import requests
 
+from config import config
+
 app = Flask(__name__)
 
 TEMPLATE = """<!doctype html>
@@ -27,9 +29,6 @@ TEMPLATE = """<!doctype html>
   </body>
 </html>"""
 
-BASE_AUTH = 'http://localhost:5000'
-BASE_RS = 'http://localhost:6000'
-
 @app.route('/')
 def demo():
     return render_template_string(TEMPLATE)
@@ -37,7 +36,7 @@ def demo():
 
 @app.route('/run')
 def run_flow():
-    r = requests.get(f"{BASE_AUTH}/authorize", params={
+    r = requests.get(f"{config.auth_server_url}/authorize", params={
         "user": "alice",
         "client_id": "agent-client-id",
         "scope": "read:data",
@@ -45,11 +44,11 @@ def run_flow():
     r.raise_for_status()
     delegation = r.json()["delegation_token"]
 
-    r = requests.post(f"{BASE_AUTH}/token", data={"delegation_token": delegation})
+    r = requests.post(f"{config.auth_server_url}/token", data={"delegation_token": delegation})
     r.raise_for_status()
     access = r.json()["access_token"]
 
-    r = requests.get(f"{BASE_RS}/data", headers={"Authorization": f"Bearer {access}"})
+    r = requests.get(f"{config.resource_server_url}/data", headers={"Authorization": f"Bearer {access}"})
     r.raise_for_status()
     body = r.json()
 
@@ -1,103 +1,113 @@
 #!/usr/bin/env python3
 """
 Startup script for Agent Delegation Protocol servers.
-Runs all servers (auth, resource, and API) in separate processes.
+Runs all servers (auth, resource, and API) as separate gunicorn processes.
 """
 
+import socket
 import subprocess
 import sys
 import time
 import signal
 import os
-from multiprocessing import Process
 from config import config
 from logging_config import get_logger
 
 logger = get_logger('startup')
 
-def run_auth_server():
-    """Run the authorization server."""
-    try:
-        from auth_server import main
-        main()
-    except Exception as e:
-        logger.error(f"Auth server failed: {str(e)}")
 
-def run_resource_server():
-    """Run the resource server."""
-    try:
-        from resource_server import main
-        main()
-    except Exception as e:
-        logger.error(f"Resource server failed: {str(e)}")
+def spawn_server(app_path: str, host: str, port: int) -> subprocess.Popen:
+    """Spawn a gunicorn process serving the given WSGI app.
+
+    Each server keeps tokens and revocations in process memory, so it runs a
+    single threaded worker instead of several processes. ``--preload`` is not
+    supported: the storage manager's background threads do not survive fork.
+    """
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn",
+            "-b", f"{host}:{port}",
+            "--workers", "1",
+            "--worker-class", "gthread",
+            "--threads", str(config.server_threads),
+            app_path,
+        ],
+        start_new_session=True,
+    )
+
+
+def wait_listen(host: str, port: int, timeout: float = 10.0) -> None:
+    """Block until a TCP connection to (host, port) succeeds."""
+    if host == "0.0.0.0":
+        host = "127.0.0.1"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.02)
+    raise RuntimeError(f"Server on {host}:{port} did not start within {timeout}s")
+
+
+def stop_servers(processes, sig=signal.SIGTERM):
+    """Forward a signal to all server processes and wait for them to exit."""
+    for process in processes:
+        if process.poll() is None:
+            process.send_signal(sig)
+    for process in processes:
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
 
-def run_api_server():
-    """Run the API server."""
-    try:
-        from api_server import main
-        main()
-    except Exception as e:
-        logger.error(f"API server failed: {str(e)}")
 
 def main():
     """Main startup function."""
     logger.info("Starting Agent Delegation Protocol servers...")
-    
+
     # List of server processes
     processes = []
-    
+
+    # Children run in their own session, so forward SIGTERM explicitly
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
     try:
         # Start authorization server
         logger.info(f"Starting Authorization Server on {config.auth_server_host}:{config.auth_server_port}")
-        auth_process = Process(target=run_auth_server, name="AuthServer")
-        auth_process.start()
-        processes.append(auth_process)
-        
-        # Wait a moment for auth server to start
-        time.sleep(2)
-        
+        processes.append(spawn_server("auth_server:app", config.auth_server_host, config.auth_server_port))
+        wait_listen(config.auth_server_host, config.auth_server_port)
+
         # Start resource server
         logger.info(f"Starting Resource Server on {config.resource_server_host}:{config.resource_server_port}")
-        resource_process = Process(target=run_resource_server, name="ResourceServer")
-        resource_process.start()
-        processes.append(resource_process)
-        
-        # Wait a moment for resource server to start
-        time.sleep(2)
-        
+        processes.append(spawn_server("resource_server:app", config.resource_server_host, config.resource_server_port))
+        wait_listen(config.resource_server_host, config.resource_server_port)
+
         # Start API server
         logger.info(f"Starting API Server on 0.0.0.0:{config.frontend_port}")
-        api_process = Process(target=run_api_server, name="APIServer")
-        api_process.start()
-        processes.append(api_process)
-        
+        processes.append(spawn_server("api_server:app", "0.0.0.0", config.frontend_port))
+        wait_listen("0.0.0.0", config.frontend_port)
+
         logger.info("All servers started successfully!")
         logger.info("Server URLs:")
         logger.info(f"  - Authorization Server: {config.auth_server_url}")
         logger.info(f"  - Resource Server: {config.resource_server_url}")
         logger.info(f"  - API Server: http://localhost:{config.frontend_port}")
         logger.info("Press Ctrl+C to stop all servers")
-        
+
         # Wait for all processes
         for process in processes:
-            process.join()
-            
-    except KeyboardInterrupt:
+            process.wait()
+
+    except (KeyboardInterrupt, SystemExit):
         logger.info("Shutting down servers...")
-        for process in processes:
-            if process.is_alive():
-                process.terminate()
-                process.join(timeout=5)
-                if process.is_alive():
-                    process.kill()
+        stop_servers(processes)
         logger.info("All servers stopped")
-    
+
     except Exception as e:
         logger.error(f"Error starting servers: {str(e)}")
-        for process in processes:
-            if process.is_alive():
-                process.terminate()
+        stop_servers(processes)
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -3,15 +3,28 @@ Storage manager for Agent Delegation Protocol.
 Provides comprehensive data persistence, retrieval, and lifecycle management.
 """
 
-import json
+import atexit
+import heapq
+import hmac
+import mmap
 import os
+import queue
+import secrets
+import signal
+import sys
+import tempfile
 import threading
+import time
+from collections import Counter, OrderedDict, defaultdict, deque
+from contextlib import ExitStack, contextmanager
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import asdict
-import uuid
+from dataclasses import asdict, replace
 from pathlib import Path
 
+import jwt
+import orjson
+
 from data_models import (
     Agent, Delegation, TokenInfo, SystemActivity, SystemStats,
     AgentStatus, DelegationStatus
@@ -21,45 +34,210 @@ from logging_config import get_logger
 
 logger = get_logger('storage_manager')
 
+# Activity journal tuning
+MAX_ACTIVITIES = 1000
+ACTIVITY_BATCH_SIZE = 100
+ACTIVITY_LOG_MAX_BYTES = 5 * 1024 * 1024
+
+# Maximum number of tracked active tokens; the oldest are dropped first
+MAX_ACTIVE_TOKENS = 10000
+
+# Maximum number of cached TokenInfo analyses
+TOKEN_INFO_CACHE_SIZE = 4096
+
+# Buffer size for storage file I/O
+IO_BUFFER_SIZE = 64 * 1024
+
+# Storage files at least this large are parsed straight from a memory map
+MMAP_MIN_BYTES = 16 * 1024
+
+# Delay before the background flusher writes, so bursts of changes coalesce
+SAVE_COALESCE_SECONDS = 0.05
+
+# Status values resolved once rather than through the enums on every call
+_AS_ACTIVE = AgentStatus.ACTIVE.value
+_AS_INACTIVE = AgentStatus.INACTIVE.value
+_AS_SUSPENDED = AgentStatus.SUSPENDED.value
+_DS_PENDING = DelegationStatus.PENDING.value
+_DS_APPROVED = DelegationStatus.APPROVED.value
+_DS_DENIED = DelegationStatus.DENIED.value
+_DS_REVOKED = DelegationStatus.REVOKED.value
+_DS_EXPIRED = DelegationStatus.EXPIRED.value
+
+
+def _dumps(data: Any) -> bytes:
+    """Serialize data for a storage file."""
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+
+
+_loads = orjson.loads
+
+
+def _ensure_storable(data: Any):
+    """Reject client-supplied data that the storage files cannot represent.
+    
+    orjson refuses values stdlib json allowed, such as integers wider than
+    64 bits; storing one would make every later save of that file fail.
+    """
+    try:
+        orjson.dumps(data)
+    except TypeError as e:
+        raise ValueError(f"Data cannot be stored: {e}")
+
+
+def _write_atomic(path: Path, payload: bytes):
+    """Write a file via a uniquely named temporary sibling and an atomic rename.
+    
+    Several server processes rewrite the same files, so each write gets its
+    own temporary file and is fsynced before it replaces the original.
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with open(fd, 'wb', buffering=IO_BUFFER_SIZE) as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def _token_expiry(token: str) -> float:
+    """Return a token's exp claim, or infinity for tokens that cannot be decoded."""
+    try:
+        claims = jwt.decode(token, options={"verify_signature": False})
+    except jwt.InvalidTokenError:
+        return float('inf')
+    return claims.get('exp', 0)
+
+
+def _read_json(path: Path) -> Any:
+    """Read and parse a storage file."""
+    with open(path, 'rb', buffering=IO_BUFFER_SIZE) as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return {}
+        if size < MMAP_MIN_BYTES:
+            return _loads(f.read())
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return _loads(view)
+
+
+def exit_on_sigterm():
+    """Turn SIGTERM into a normal interpreter exit.
+    
+    The default SIGTERM action kills the process without running atexit
+    handlers, which would drop writes still pending in the background
+    threads. Call this from a server's main() before serving.
+    """
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
 
 class StorageManager:
     """Comprehensive storage manager for all data persistence needs."""
     
     def __init__(self):
         """Initialize storage manager."""
-        self._lock = threading.RLock()
+        # Per-domain locks. When several are needed, acquire them in this
+        # order to avoid deadlocks: agents > users > delegations > tokens > activities
+        self._agents_lock = threading.RLock()
+        self._users_lock = threading.RLock()
+        self._delegations_lock = threading.RLock()
+        self._tokens_lock = threading.RLock()
+        self._activities_lock = threading.RLock()
         self._agents: Dict[str, Agent] = {}
         self._users: Dict[str, str] = {}
         self._delegations: Dict[str, Delegation] = {}
-        self._active_tokens: List[str] = []
+        # Active token -> exp claim, plus a min-heap of (exp, token) for expiry sweeps
+        self._active_tokens: OrderedDict[str, float] = OrderedDict()
+        self._token_expiry_heap: List[Tuple[float, str]] = []
         self._revoked_tokens: set = set()
-        self._system_activities: List[SystemActivity] = []
+        # Immutable copy of _revoked_tokens read without locking by is_token_revoked
+        self._revoked_tokens_snapshot: frozenset = frozenset()
+        # Bumped on every change to _revoked_tokens to invalidate cached analyses
+        self._revoked_version = 0
+        self._token_info_cache: "OrderedDict[Tuple[str, int], TokenInfo]" = OrderedDict()
+        # Bounded: appending past MAX_ACTIVITIES drops the oldest entry
+        self._system_activities: "deque[SystemActivity]" = deque(maxlen=MAX_ACTIVITIES)
+        
+        # Status tallies maintained by the mutators so stats never scan
+        self._agent_status_counts: Counter = Counter()
+        self._delegation_status_counts: Counter = Counter()
+        
+        # Lowercased "name\x00description" per agent, used by list_agents search
+        self._agent_search_text: Dict[str, str] = {}
         
-        # File paths
-        self.agents_file = Path(config.agents_file)
-        self.users_file = Path(config.users_file)
-        self.delegations_file = Path("delegations.json")
-        self.tokens_file = Path("tokens.json")
-        self.activities_file = Path("activities.json")
+        # Secondary indices of delegation IDs used by list_delegations
+        self._delegations_by_status: Dict[str, set] = defaultdict(set)
+        self._delegations_by_agent: Dict[str, set] = defaultdict(set)
+        self._delegations_by_user: Dict[str, set] = defaultdict(set)
+        
+        # Write-behind state: mutators mark files dirty and a daemon thread saves them
+        self._dirty = {'agents': False, 'users': False, 'delegations': False, 'tokens': False}
+        self._dirty_event = threading.Event()
+        # Taken before any domain lock when flushing dirty files
+        self._write_lock = threading.Lock()
+        self._closed = False
+        
+        # File paths, made absolute so a later chdir cannot redirect the flusher
+        self.agents_file = Path(config.agents_file).resolve()
+        self.users_file = Path(config.users_file).resolve()
+        self.delegations_file = Path(config.delegations_file).resolve()
+        self.tokens_file = Path(config.tokens_file).resolve()
+        self.activities_file = Path(config.activities_file).resolve()
         
         # Load existing data
         self._load_all_data()
+        
+        # Activities are journaled append-only by a dedicated writer thread
+        self._activities_fp = open(self.activities_file, 'ab', buffering=IO_BUFFER_SIZE)
+        self._activity_queue: "queue.Queue[Optional[SystemActivity]]" = queue.Queue()
+        
+        self._flusher = threading.Thread(target=self._flush_loop, name='storage-flusher', daemon=True)
+        self._flusher.start()
+        self._activity_writer = threading.Thread(
+            target=self._write_activities_loop, name='activity-writer', daemon=True
+        )
+        self._activity_writer.start()
+        atexit.register(self.flush)
+    
+    @contextmanager
+    def _all_locks(self):
+        """Hold every domain lock, acquired in the documented order."""
+        with ExitStack() as stack:
+            for lock in (self._agents_lock, self._users_lock, self._delegations_lock,
+                         self._tokens_lock, self._activities_lock):
+                stack.enter_context(lock)
+            yield
     
     def _load_all_data(self):
         """Load all data from storage files."""
-        with self._lock:
+        with self._all_locks():
             self._load_agents()
             self._load_users()
             self._load_delegations()
             self._load_tokens()
             self._load_activities()
+            
+            # Keep dicts in creation order so listings can iterate newest-first
+            self._agents = dict(sorted(self._agents.items(), key=lambda item: item[1].created_at))
+            self._delegations = dict(
+                sorted(self._delegations.items(), key=lambda item: item[1].created_at)
+            )
+            
+            self._agent_status_counts = Counter(a.status for a in self._agents.values())
+            for agent in self._agents.values():
+                self._index_agent(agent)
+            for delegation in self._delegations.values():
+                self._index_delegation(delegation)
     
     def _load_agents(self):
         """Load agents from storage."""
         try:
             if self.agents_file.exists():
-                with open(self.agents_file, 'r') as f:
-                    data = json.load(f)
+                data = _read_json(self.agents_file)
                     
                 for agent_id, agent_data in data.items():
                     try:
@@ -96,7 +274,7 @@ class StorageManager:
                     scopes=["read:calendar", "write:calendar"]
                 )
                 self._agents[default_agent.id] = default_agent
-                self._save_agents()
+                self._mark_dirty('agents')
                 
         except Exception as e:
             logger.error(f"Error loading agents: {e}")
@@ -105,12 +283,11 @@ class StorageManager:
         """Load users from storage."""
         try:
             if self.users_file.exists():
-                with open(self.users_file, 'r') as f:
-                    self._users = json.load(f)
+                self._users = _read_json(self.users_file)
             else:
                 # Create default user
                 self._users = {"alice": "password123"}
-                self._save_users()
+                self._mark_dirty('users')
         except Exception as e:
             logger.error(f"Error loading users: {e}")
             self._users = {"alice": "password123"}
@@ -119,8 +296,7 @@ class StorageManager:
         """Load delegations from storage."""
         try:
             if self.delegations_file.exists():
-                with open(self.delegations_file, 'r') as f:
-                    data = json.load(f)
+                data = _read_json(self.delegations_file)
                     
                 for delegation_id, delegation_data in data.items():
                     try:
@@ -136,105 +312,259 @@ class StorageManager:
         """Load token data from storage."""
         try:
             if self.tokens_file.exists():
-                with open(self.tokens_file, 'r') as f:
-                    data = json.load(f)
-                    self._active_tokens = data.get('active_tokens', [])
-                    self._revoked_tokens = set(data.get('revoked_tokens', []))
+                data = _read_json(self.tokens_file)
+                self._active_tokens = OrderedDict()
+                self._token_expiry_heap = []
+                for token in data.get('active_tokens', [])[-MAX_ACTIVE_TOKENS:]:
+                    self._track_active_token(token)
+                self._revoked_tokens = set(data.get('revoked_tokens', []))
+                self._revoked_tokens_changed()
         except Exception as e:
             logger.error(f"Error loading tokens: {e}")
     
+    def _import_legacy_activities(self):
+        """Convert the pre-journal activities.json array into the JSONL journal once."""
+        legacy_file = self.activities_file.with_suffix('.json')
+        if self.activities_file.exists() or not legacy_file.exists():
+            return
+        try:
+            records = _read_json(legacy_file) or []
+            _write_atomic(self.activities_file, b"".join(
+                orjson.dumps(record) + b"\n" for record in records[-MAX_ACTIVITIES:]
+            ))
+            logger.info(f"Imported activity history from {legacy_file}")
+        except Exception as e:
+            logger.error(f"Error importing legacy activities: {e}")
+    
     def _load_activities(self):
-        """Load system activities from storage."""
+        """Load the most recent system activities from the journal."""
+        self._import_legacy_activities()
         try:
             if self.activities_file.exists():
-                with open(self.activities_file, 'r') as f:
-                    data = json.load(f)
+                # Only the last MAX_ACTIVITIES lines are ever kept
+                with open(self.activities_file, 'rb', buffering=IO_BUFFER_SIZE) as f:
+                    lines = deque(f, maxlen=MAX_ACTIVITIES)
                     
-                for activity_data in data:
+                for line in lines:
+                    if not line.strip():
+                        continue
                     try:
-                        self._system_activities.append(SystemActivity.from_dict(activity_data))
+                        self._system_activities.append(SystemActivity.from_dict(_loads(line)))
                     except Exception as e:
                         logger.error(f"Error loading activity: {e}")
                         continue
-                        
-                # Keep only recent activities (last 1000)
-                if len(self._system_activities) > 1000:
-                    self._system_activities = self._system_activities[-1000:]
         except Exception as e:
             logger.error(f"Error loading activities: {e}")
     
-    def _save_agents(self):
-        """Save agents to storage."""
-        try:
-            data = {}
-            for agent_id, agent in self._agents.items():
-                data[agent_id] = agent.to_dict()
-            
-            with open(self.agents_file, 'w') as f:
-                json.dump(data, f, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving agents: {e}")
+    def _dump_agents(self) -> bytes:
+        """Serialize agents for storage."""
+        data = {}
+        for agent_id, agent in self._agents.items():
+            data[agent_id] = agent.to_dict()
+        return _dumps(data)
     
-    def _save_users(self):
-        """Save users to storage."""
-        try:
-            with open(self.users_file, 'w') as f:
-                json.dump(self._users, f, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving users: {e}")
+    def _dump_users(self) -> bytes:
+        """Serialize users for storage."""
+        return _dumps(self._users)
     
-    def _save_delegations(self):
-        """Save delegations to storage."""
-        try:
-            data = {}
-            for delegation_id, delegation in self._delegations.items():
-                data[delegation_id] = delegation.to_dict()
-            
-            with open(self.delegations_file, 'w') as f:
-                json.dump(data, f, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving delegations: {e}")
+    def _dump_delegations(self) -> bytes:
+        """Serialize delegations for storage."""
+        data = {}
+        for delegation_id, delegation in self._delegations.items():
+            data[delegation_id] = delegation.to_dict()
+        return _dumps(data)
     
-    def _save_tokens(self):
-        """Save token data to storage."""
-        try:
-            data = {
-                'active_tokens': self._active_tokens,
-                'revoked_tokens': list(self._revoked_tokens)
-            }
+    def _dump_tokens(self) -> bytes:
+        """Serialize token data for storage."""
+        data = {
+            'active_tokens': list(self._active_tokens),
+            'revoked_tokens': list(self._revoked_tokens)
+        }
+        return _dumps(data)
+    
+    def _mark_dirty(self, name: str):
+        """Schedule a storage file to be rewritten by the background flusher."""
+        self._dirty[name] = True
+        self._dirty_event.set()
+    
+    def _flush_loop(self):
+        """Background thread coalescing dirty flags into file rewrites."""
+        while not self._closed:
+            self._dirty_event.wait()
+            time.sleep(SAVE_COALESCE_SECONDS)
+            self._flush_dirty()
+    
+    def _flush_dirty(self):
+        """Rewrite every storage file marked dirty since the last flush."""
+        files = {
+            'agents': (self._agents_lock, self._dump_agents, self.agents_file),
+            'users': (self._users_lock, self._dump_users, self.users_file),
+            'delegations': (self._delegations_lock, self._dump_delegations, self.delegations_file),
+            'tokens': (self._tokens_lock, self._dump_tokens, self.tokens_file),
+        }
+        # Serializes flushes so an older snapshot never replaces a newer one
+        with self._write_lock:
+            self._dirty_event.clear()
+            for name, (lock, dump, path) in files.items():
+                # Snapshot under the domain lock, but write to disk outside it
+                with lock:
+                    if not self._dirty[name]:
+                        continue
+                    self._dirty[name] = False
+                    try:
+                        payload = dump()
+                    except Exception as e:
+                        logger.error(f"Error saving {name}: {e}")
+                        continue
+                try:
+                    _write_atomic(path, payload)
+                except Exception as e:
+                    logger.error(f"Error saving {name}: {e}")
+    
+    def _write_activities_loop(self):
+        """Drain queued activities and append them to the journal in batches."""
+        while True:
+            batch = [self._activity_queue.get()]
+            try:
+                while len(batch) < ACTIVITY_BATCH_SIZE:
+                    batch.append(self._activity_queue.get_nowait())
+            except queue.Empty:
+                pass
             
-            with open(self.tokens_file, 'w') as f:
-                json.dump(data, f, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving tokens: {e}")
+            activities = [activity for activity in batch if activity is not None]
+            try:
+                # Only this thread touches the journal, so no lock is needed here
+                self._append_activities(activities)
+            finally:
+                for _ in batch:
+                    self._activity_queue.task_done()
+            
+            # None is the shutdown sentinel queued by close()
+            if len(activities) != len(batch):
+                return
     
-    def _save_activities(self):
-        """Save system activities to storage."""
+    def _append_activities(self, activities: List[SystemActivity]):
+        """Append activity records to the journal, rotating it if it grew too large."""
         try:
-            data = [activity.to_dict() for activity in self._system_activities]
-            
-            with open(self.activities_file, 'w') as f:
-                json.dump(data, f, indent=2)
+            self._activities_fp.write(b"".join(orjson.dumps(a.to_dict()) + b"\n" for a in activities))
+            self._activities_fp.flush()
+            if os.fstat(self._activities_fp.fileno()).st_size > ACTIVITY_LOG_MAX_BYTES:
+                self._rotate_activities()
         except Exception as e:
             logger.error(f"Error saving activities: {e}")
     
+    def _rotate_activities(self):
+        """Move the journal aside and start a new one holding only recent activities."""
+        self._activities_fp.close()
+        os.replace(self.activities_file, self.activities_file.with_name(self.activities_file.name + '.old'))
+        self._activities_fp = open(self.activities_file, 'ab', buffering=IO_BUFFER_SIZE)
+        # Activities still queued will be appended by the writer, so leave them out.
+        # log_activity appends and enqueues under the lock, so the two agree.
+        with self._activities_lock:
+            recent = list(self._system_activities)
+            pending = self._activity_queue.qsize()
+        if pending:
+            recent = recent[:-pending]
+        for activity in recent:
+            self._activities_fp.write(orjson.dumps(activity.to_dict()) + b"\n")
+        self._activities_fp.flush()
+    
+    def flush(self):
+        """Write pending file changes and queued activity records to disk."""
+        self._flush_dirty()
+        # Only the writer thread consumes the queue; without it join() would never return
+        if self._activity_writer.is_alive():
+            self._activity_queue.join()
+    
+    def close(self):
+        """Flush pending writes, stop the background threads and close the journal."""
+        if self._closed:
+            return
+        self.flush()
+        with self._activities_lock:
+            self._closed = True
+            self._dirty_event.set()
+            self._activity_queue.put(None)
+        self._flusher.join()
+        self._activity_writer.join()
+        self._activities_fp.close()
+    
+    def reset(self, users: Optional[Dict[str, str]] = None, clear_tokens: bool = True):
+        """Restore in-memory state without reloading the files.
+        
+        Replaces the user table with ``users`` when given and forgets every
+        issued and revoked token when ``clear_tokens`` is set. Files are only
+        marked dirty if something actually changed.
+        """
+        if clear_tokens:
+            with self._tokens_lock:
+                if self._active_tokens or self._revoked_tokens:
+                    self._active_tokens.clear()
+                    self._token_expiry_heap.clear()
+                    self._revoked_tokens.clear()
+                    self._revoked_tokens_changed()
+                    self._mark_dirty('tokens')
+        if users is not None:
+            with self._users_lock:
+                if self._users != users:
+                    self._users.clear()
+                    self._users.update(users)
+                    self._mark_dirty('users')
+    
+    @staticmethod
+    def _move_status(counts: Counter, old_status: Optional[str], new_status: Optional[str]):
+        """Move one record between status tallies; None means added or removed."""
+        if old_status == new_status:
+            return
+        if old_status is not None:
+            counts[old_status] -= 1
+        if new_status is not None:
+            counts[new_status] += 1
+    
+    def _agent_status_changed(self, old_status: Optional[str], new_status: Optional[str]):
+        """Record an agent status transition."""
+        self._move_status(self._agent_status_counts, old_status, new_status)
+    
+    def _delegation_status_changed(self, delegation_id: str, old_status: Optional[str],
+                                   new_status: str):
+        """Record a delegation status transition in the tallies and status index."""
+        self._move_status(self._delegation_status_counts, old_status, new_status)
+        if old_status is not None:
+            self._delegations_by_status[old_status].discard(delegation_id)
+        self._delegations_by_status[new_status].add(delegation_id)
+    
+    def _index_agent(self, agent: Agent):
+        """Refresh the precomputed search text for an agent."""
+        self._agent_search_text[agent.id] = f"{agent.name}\x00{agent.description}".lower()
+    
+    def _index_delegation(self, delegation: Delegation):
+        """Add a delegation to the secondary indices and status tallies."""
+        self._delegations_by_agent[delegation.agent_id].add(delegation.id)
+        self._delegations_by_user[delegation.user_id].add(delegation.id)
+        self._delegation_status_changed(delegation.id, None, delegation.status)
+    
     # ============================================================================
     # AGENT MANAGEMENT
     # ============================================================================
     
     def create_agent(self, agent_data: Dict[str, Any]) -> Agent:
         """Create a new agent."""
-        with self._lock:
-            agent_id = agent_data.get('id') or f"agent-{uuid.uuid4().hex[:8]}"
+        with self._agents_lock:
+            agent_id = agent_data.get('id') or f"agent-{secrets.token_hex(4)}"
             
             if agent_id in self._agents:
                 raise ValueError(f"Agent with ID {agent_id} already exists")
+            _ensure_storable(agent_data)
             
             agent_data['id'] = agent_id
+            # Creation time is server-assigned: listings rely on _agents being in created_at order
+            agent_data.pop('created_at', None)
             agent = Agent.from_dict(agent_data)
             
             self._agents[agent_id] = agent
-            self._save_agents()
+            self._agent_status_changed(None, agent.status)
+            self._index_agent(agent)
+            self._mark_dirty('agents')
             
             self.log_activity(
                 action="agent_created",
@@ -246,41 +576,52 @@ class StorageManager:
     
     def get_agent(self, agent_id: str) -> Optional[Agent]:
         """Get agent by ID."""
-        with self._lock:
+        with self._agents_lock:
             return self._agents.get(agent_id)
     
     def list_agents(self, status_filter: Optional[str] = None, 
                    search: Optional[str] = None) -> List[Agent]:
         """List agents with optional filtering."""
-        with self._lock:
-            agents = list(self._agents.values())
-            
-            if status_filter:
-                agents = [a for a in agents if a.status == status_filter]
+        with self._agents_lock:
+            search_lower = search.lower() if search else None
             
-            if search:
-                search_lower = search.lower()
-                agents = [
-                    a for a in agents 
-                    if search_lower in a.name.lower() or search_lower in a.description.lower()
-                ]
+            # Agents are stored in creation order, so walk them newest-first
+            agents = []
+            for agent in reversed(self._agents.values()):
+                if status_filter and agent.status != status_filter:
+                    continue
+                if search_lower and search_lower not in self._agent_search_text[agent.id]:
+                    continue
+                agents.append(agent)
             
-            return sorted(agents, key=lambda x: x.created_at, reverse=True)
+            return agents
     
     def update_agent(self, agent_id: str, updates: Dict[str, Any]) -> Agent:
         """Update agent."""
-        with self._lock:
-            if agent_id not in self._agents:
+        with self._agents_lock:
+            agent = self._agents.get(agent_id)
+            if agent is None:
                 raise ValueError(f"Agent {agent_id} not found")
             
-            agent = self._agents[agent_id]
+            _ensure_storable(updates)
+            old_status = agent.status
             
-            # Update allowed fields
+            # Update allowed fields, remembering whether anything actually changed
+            changed = False
             for field, value in updates.items():
-                if hasattr(agent, field) and field != 'id':
+                if (hasattr(agent, field) and field not in ('id', 'created_at')
+                        and getattr(agent, field) != value):
                     setattr(agent, field, value)
+                    changed = True
             
-            self._save_agents()
+            # No-op updates leave the agents file and activity log untouched
+            if not changed:
+                return agent
+            
+            self._agent_status_changed(old_status, agent.status)
+            self._index_agent(agent)
+            
+            self._mark_dirty('agents')
             
             self.log_activity(
                 action="agent_updated",
@@ -292,19 +633,23 @@ class StorageManager:
     
     def delete_agent(self, agent_id: str) -> bool:
         """Delete agent."""
-        with self._lock:
-            if agent_id not in self._agents:
+        with self._agents_lock, self._delegations_lock:
+            agent = self._agents.pop(agent_id, None)
+            if agent is None:
                 return False
             
-            agent_name = self._agents[agent_id].name
-            del self._agents[agent_id]
-            self._save_agents()
+            del self._agent_search_text[agent_id]
+            agent_name = agent.name
+            self._agent_status_changed(agent.status, None)
+            self._mark_dirty('agents')
             
             # Also revoke all delegations for this agent
-            for delegation in self._delegations.values():
-                if delegation.agent_id == agent_id and delegation.status == DelegationStatus.APPROVED.value:
+            for delegation_id in list(self._delegations_by_agent.get(agent_id, ())):
+                delegation = self._delegations[delegation_id]
+                if delegation.status == _DS_APPROVED:
                     delegation.revoke()
-            self._save_delegations()
+                    self._delegation_status_changed(delegation_id, _DS_APPROVED, delegation.status)
+                    self._mark_dirty('delegations')
             
             self.log_activity(
                 action="agent_deleted",
@@ -320,12 +665,12 @@ class StorageManager:
     
     def create_user(self, username: str, password: str) -> bool:
         """Create a new user."""
-        with self._lock:
+        with self._users_lock:
             if username in self._users:
                 return False
             
             self._users[username] = password
-            self._save_users()
+            self._mark_dirty('users')
             
             self.log_activity(
                 action="user_created",
@@ -337,18 +682,22 @@ class StorageManager:
     
     def get_user(self, username: str) -> Optional[str]:
         """Get user password."""
-        with self._lock:
+        with self._users_lock:
             return self._users.get(username)
     
     def list_users(self) -> List[str]:
         """List all usernames."""
-        with self._lock:
+        with self._users_lock:
             return list(self._users.keys())
     
     def validate_user(self, username: str, password: str) -> bool:
         """Validate user credentials."""
-        with self._lock:
-            return self._users.get(username) == password
+        with self._users_lock:
+            stored = self._users.get(username)
+        if stored is None:
+            return False
+        # Constant-time comparison so response timing does not leak the password
+        return hmac.compare_digest(stored.encode(), password.encode())
     
     # ============================================================================
     # DELEGATION MANAGEMENT
@@ -356,23 +705,28 @@ class StorageManager:
     
     def create_delegation(self, delegation_data: Dict[str, Any]) -> Delegation:
         """Create a new delegation."""
-        with self._lock:
-            delegation_id = f"delegation-{uuid.uuid4().hex[:8]}"
+        with self._agents_lock, self._users_lock, self._delegations_lock:
+            _ensure_storable(delegation_data)
+            delegation_id = f"delegation-{secrets.token_hex(4)}"
             delegation_data['id'] = delegation_id
             
             # Validate agent and user exist
-            if delegation_data['agent_id'] not in self._agents:
+            agent = self._agents.get(delegation_data['agent_id'])
+            if agent is None:
                 raise ValueError("Agent not found")
             
             if delegation_data['user_id'] not in self._users:
                 raise ValueError("User not found")
             
             # Set agent name
-            delegation_data['agent_name'] = self._agents[delegation_data['agent_id']].name
+            delegation_data['agent_name'] = agent.name
             
+            # Creation time is server-assigned: listings rely on _delegations being in created_at order
+            delegation_data.pop('created_at', None)
             delegation = Delegation.from_dict(delegation_data)
             self._delegations[delegation_id] = delegation
-            self._save_delegations()
+            self._index_delegation(delegation)
+            self._mark_dirty('delegations')
             
             self.log_activity(
                 action="delegation_created",
@@ -391,42 +745,48 @@ class StorageManager:
     
     def get_delegation(self, delegation_id: str) -> Optional[Delegation]:
         """Get delegation by ID."""
-        with self._lock:
+        with self._delegations_lock:
             return self._delegations.get(delegation_id)
     
     def list_delegations(self, status_filter: Optional[str] = None,
                         agent_id_filter: Optional[str] = None,
                         user_id_filter: Optional[str] = None) -> List[Delegation]:
         """List delegations with optional filtering."""
-        with self._lock:
-            delegations = list(self._delegations.values())
+        with self._delegations_lock:
+            # Intersect the index entries for each requested filter
+            ids = None
+            for index, key in ((self._delegations_by_status, status_filter),
+                               (self._delegations_by_agent, agent_id_filter),
+                               (self._delegations_by_user, user_id_filter)):
+                if key:
+                    matches = index.get(key, set())
+                    ids = set(matches) if ids is None else ids & matches
             
-            if status_filter:
-                delegations = [d for d in delegations if d.status == status_filter]
-            
-            if agent_id_filter:
-                delegations = [d for d in delegations if d.agent_id == agent_id_filter]
-            
-            if user_id_filter:
-                delegations = [d for d in delegations if d.user_id == user_id_filter]
+            # Delegations are stored in creation order; only filtered matches need sorting
+            if ids is None:
+                return list(reversed(self._delegations.values()))
             
+            delegations = [self._delegations[delegation_id] for delegation_id in ids]
             return sorted(delegations, key=lambda x: x.created_at, reverse=True)
     
     def approve_delegation(self, delegation_id: str) -> str:
         """Approve a delegation and return delegation token."""
-        with self._lock:
-            if delegation_id not in self._delegations:
+        with self._agents_lock, self._delegations_lock:
+            delegation = self._delegations.get(delegation_id)
+            if delegation is None:
                 raise ValueError("Delegation not found")
             
-            delegation = self._delegations[delegation_id]
+            old_status = delegation.status
             delegation_token = delegation.approve()
+            self._delegation_status_changed(delegation_id, old_status, delegation.status)
             
             # Update agent delegation count
-            if delegation.agent_id in self._agents:
-                self._agents[delegation.agent_id].increment_delegation_count()
-                self._save_agents()
+            agent = self._agents.get(delegation.agent_id)
+            if agent is not None:
+                agent.increment_delegation_count()
+                self._mark_dirty('agents')
             
-            self._save_delegations()
+            self._mark_dirty('delegations')
             
             self.log_activity(
                 action="delegation_approved",
@@ -440,13 +800,15 @@ class StorageManager:
     
     def deny_delegation(self, delegation_id: str) -> bool:
         """Deny a delegation."""
-        with self._lock:
-            if delegation_id not in self._delegations:
+        with self._delegations_lock:
+            delegation = self._delegations.get(delegation_id)
+            if delegation is None:
                 return False
             
-            delegation = self._delegations[delegation_id]
+            old_status = delegation.status
             delegation.deny()
-            self._save_delegations()
+            self._delegation_status_changed(delegation_id, old_status, delegation.status)
+            self._mark_dirty('delegations')
             
             self.log_activity(
                 action="delegation_denied",
@@ -460,21 +822,24 @@ class StorageManager:
     
     def revoke_delegation(self, delegation_id: str) -> bool:
         """Revoke a delegation."""
-        with self._lock:
-            if delegation_id not in self._delegations:
+        with self._delegations_lock, self._tokens_lock:
+            delegation = self._delegations.get(delegation_id)
+            if delegation is None:
                 return False
             
-            delegation = self._delegations[delegation_id]
             
             # Add tokens to revoked list
             if delegation.delegation_token:
                 self._revoked_tokens.add(delegation.delegation_token)
             if delegation.access_token:
                 self._revoked_tokens.add(delegation.access_token)
+            self._revoked_tokens_changed()
             
+            old_status = delegation.status
             delegation.revoke()
-            self._save_delegations()
-            self._save_tokens()
+            self._delegation_status_changed(delegation_id, old_status, delegation.status)
+            self._mark_dirty('delegations')
+            self._mark_dirty('tokens')
             
             self.log_activity(
                 action="delegation_revoked",
@@ -492,35 +857,80 @@ class StorageManager:
     
     def add_active_token(self, token: str):
         """Add token to active tokens list."""
-        with self._lock:
+        with self._tokens_lock:
             if token not in self._active_tokens:
-                self._active_tokens.append(token)
-                self._save_tokens()
+                self._track_active_token(token)
+                if len(self._active_tokens) > MAX_ACTIVE_TOKENS:
+                    self._active_tokens.popitem(last=False)
+                self._mark_dirty('tokens')
+    
+    def _track_active_token(self, token: str):
+        """Record an active token and schedule its expiry.
+        
+        Must be called with _tokens_lock held.
+        """
+        exp = _token_expiry(token)
+        self._active_tokens[token] = exp
+        # Undecodable tokens never expire, so they stay out of the heap
+        if exp != float('inf'):
+            heapq.heappush(self._token_expiry_heap, (exp, token))
     
     def revoke_token(self, token: str):
         """Revoke a specific token."""
-        with self._lock:
+        with self._tokens_lock:
             self._revoked_tokens.add(token)
-            self._save_tokens()
+            self._revoked_tokens_changed()
+            self._mark_dirty('tokens')
             
             self.log_activity(
                 action="token_revoked",
                 details={"token_preview": token[:20] + "..."}
             )
     
+    def _revoked_tokens_changed(self):
+        """Publish a new revoked-token snapshot and invalidate cached analyses.
+        
+        Must be called with _tokens_lock held.
+        """
+        self._revoked_tokens_snapshot = frozenset(self._revoked_tokens)
+        self._revoked_version += 1
+    
     def is_token_revoked(self, token: str) -> bool:
         """Check if token is revoked."""
-        with self._lock:
-            return token in self._revoked_tokens
+        # Lock-free: the snapshot is replaced, never mutated
+        return token in self._revoked_tokens_snapshot
+    
+    def _get_token_info(self, token: str) -> TokenInfo:
+        """Analyze a token, reusing the cached analysis while it is still accurate."""
+        key = (token, self._revoked_version)
+        token_info = self._token_info_cache.get(key)
+        
+        if token_info is not None and token_info.is_valid:
+            # A cached valid token only goes stale by expiring
+            seconds_left = int(token_info.claims.get('exp', 0) - time.time())
+            if seconds_left > 0:
+                self._token_info_cache.move_to_end(key)
+                return replace(token_info, time_to_expiry_seconds=seconds_left)
+            token_info = None
+        
+        if token_info is None:
+            token_info = TokenInfo.from_token(token, self._revoked_tokens)
+            self._token_info_cache[key] = token_info
+            if len(self._token_info_cache) > TOKEN_INFO_CACHE_SIZE:
+                self._token_info_cache.popitem(last=False)
+        else:
+            self._token_info_cache.move_to_end(key)
+        
+        return token_info
     
     def get_active_tokens(self) -> List[TokenInfo]:
         """Get list of active tokens with analysis."""
-        with self._lock:
+        with self._tokens_lock:
             active_tokens = []
             
             for token in self._active_tokens:
                 if token not in self._revoked_tokens:
-                    token_info = TokenInfo.from_token(token, self._revoked_tokens)
+                    token_info = self._get_token_info(token)
                     if token_info.is_valid:
                         active_tokens.append(token_info)
             
@@ -528,26 +938,29 @@ class StorageManager:
     
     def introspect_token(self, token: str) -> TokenInfo:
         """Perform detailed token analysis."""
-        with self._lock:
+        with self._tokens_lock:
             return TokenInfo.from_token(token, self._revoked_tokens)
     
     def cleanup_expired_tokens(self):
         """Remove expired tokens from active list."""
-        with self._lock:
-            valid_tokens = []
+        with self._tokens_lock:
+            now = time.time()
+            heap = self._token_expiry_heap
+            removed_count = 0
             
-            for token in self._active_tokens:
-                token_info = TokenInfo.from_token(token, self._revoked_tokens)
-                if not token_info.is_expired:
-                    valid_tokens.append(token)
+            while heap and heap[0][0] <= now:
+                exp, token = heapq.heappop(heap)
+                # Skip stale entries for tokens already evicted or re-added
+                if self._active_tokens.get(token) == exp:
+                    del self._active_tokens[token]
+                    removed_count += 1
             
-            if len(valid_tokens) != len(self._active_tokens):
-                self._active_tokens = valid_tokens
-                self._save_tokens()
+            if removed_count:
+                self._mark_dirty('tokens')
                 
                 self.log_activity(
                     action="tokens_cleaned",
-                    details={"removed_count": len(self._active_tokens) - len(valid_tokens)}
+                    details={"removed_count": removed_count}
                 )
     
     # ============================================================================
@@ -558,9 +971,9 @@ class StorageManager:
                     user: Optional[str] = None, agent_id: Optional[str] = None,
                     delegation_id: Optional[str] = None):
         """Log system activity."""
-        with self._lock:
+        with self._activities_lock:
             activity = SystemActivity(
-                id=f"activity-{uuid.uuid4().hex[:8]}",
+                id=f"activity-{secrets.token_hex(4)}",
                 timestamp=datetime.utcnow().isoformat(),
                 action=action,
                 details=details,
@@ -570,18 +983,15 @@ class StorageManager:
             )
             
             self._system_activities.append(activity)
-            
-            # Keep only last 1000 activities
-            if len(self._system_activities) > 1000:
-                self._system_activities = self._system_activities[-1000:]
-            
-            self._save_activities()
+            # The writer thread does the disk I/O; after close() activities stay in memory
+            if not self._closed:
+                self._activity_queue.put(activity)
     
     def get_activities(self, limit: int = 50) -> List[SystemActivity]:
         """Get recent system activities."""
-        with self._lock:
+        with self._activities_lock:
             limit = min(limit, 100)  # Cap at 100
-            return self._system_activities[-limit:] if self._system_activities else []
+            return list(self._system_activities)[-limit:]
     
     # ============================================================================
     # STATISTICS
@@ -589,36 +999,51 @@ class StorageManager:
     
     def get_system_stats(self) -> SystemStats:
         """Get comprehensive system statistics."""
-        with self._lock:
-            # Agent stats
-            agent_statuses = [agent.status for agent in self._agents.values()]
-            
-            # Delegation stats
-            delegation_statuses = [delegation.status for delegation in self._delegations.values()]
-            
+        with self._agents_lock, self._users_lock, self._delegations_lock, self._tokens_lock:
             # Token stats
             active_token_count = len([
                 t for t in self._active_tokens 
                 if t not in self._revoked_tokens and 
-                TokenInfo.from_token(t, self._revoked_tokens).is_valid
+                self._get_token_info(t).is_valid
             ])
             
+            agent_counts = self._agent_status_counts
+            delegation_counts = self._delegation_status_counts
+            
             return SystemStats(
                 total_agents=len(self._agents),
-                active_agents=agent_statuses.count(AgentStatus.ACTIVE.value),
-                inactive_agents=agent_statuses.count(AgentStatus.INACTIVE.value),
-                suspended_agents=agent_statuses.count(AgentStatus.SUSPENDED.value),
+                active_agents=agent_counts[_AS_ACTIVE],
+                inactive_agents=agent_counts[_AS_INACTIVE],
+                suspended_agents=agent_counts[_AS_SUSPENDED],
                 total_delegations=len(self._delegations),
-                pending_delegations=delegation_statuses.count(DelegationStatus.PENDING.value),
-                approved_delegations=delegation_statuses.count(DelegationStatus.APPROVED.value),
-                denied_delegations=delegation_statuses.count(DelegationStatus.DENIED.value),
-                revoked_delegations=delegation_statuses.count(DelegationStatus.REVOKED.value),
-                expired_delegations=delegation_statuses.count(DelegationStatus.EXPIRED.value),
+                pending_delegations=delegation_counts[_DS_PENDING],
+                approved_delegations=delegation_counts[_DS_APPROVED],
+                denied_delegations=delegation_counts[_DS_DENIED],
+                revoked_delegations=delegation_counts[_DS_REVOKED],
+                expired_delegations=delegation_counts[_DS_EXPIRED],
                 active_tokens=active_token_count,
                 revoked_tokens=len(self._revoked_tokens),
                 total_users=len(self._users)
             )
 
 
-# Global storage manager instance
-storage_manager = StorageManager()
\ No newline at end of file
+# Process-wide storage manager, created on first use rather than at import
+_instance: Optional[StorageManager] = None
+_instance_lock = threading.Lock()
+
+
+def get_storage_manager() -> StorageManager:
+    """Return the global storage manager, loading storage files on first call."""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = StorageManager()
+    return _instance
+
+
+def __getattr__(name: str) -> Any:
+    """Keep `from storage_manager import storage_manager` working lazily."""
+    if name == 'storage_manager':
+        return get_storage_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
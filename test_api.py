@@ -6,29 +6,32 @@ Tests all the new functionality added to the backend.
 
 import requests
 import json
-import time
 from config import config
+from run_servers import wait_listen
 
 # Server URLs
 AUTH_URL = config.auth_server_url
 RESOURCE_URL = config.resource_server_url
 API_URL = f"http://localhost:{config.frontend_port}"
 
+# Reuse connections across the whole run
+session = requests.Session()
+
 def test_health_endpoints():
     """Test health endpoints for all servers."""
     print("Testing health endpoints...")
     
     try:
         # Test auth server health
-        response = requests.get(f"{AUTH_URL}/health", timeout=5)
+        response = session.get(f"{AUTH_URL}/health", timeout=5)
         print(f"Auth server health: {response.status_code} - {response.json()}")
         
         # Test resource server health
-        response = requests.get(f"{RESOURCE_URL}/health", timeout=5)
+        response = session.get(f"{RESOURCE_URL}/health", timeout=5)
         print(f"Resource server health: {response.status_code} - {response.json()}")
         
         # Test API server health
-        response = requests.get(f"{API_URL}/api/status", timeout=5)
+        response = session.get(f"{API_URL}/api/status", timeout=5)
         print(f"API server status: {response.status_code} - {response.json()}")
         
     except requests.RequestException as e:
@@ -49,23 +52,23 @@ def test_agent_management():
             "scopes": ["read:data", "write:data"]
         }
         
-        response = requests.post(f"{API_URL}/api/agents", json=agent_data)
+        response = session.post(f"{API_URL}/api/agents", json=agent_data)
         print(f"Create agent: {response.status_code} - {response.json()}")
         
         if response.status_code == 201:
             agent_id = response.json()['agent']['id']
             
             # List agents
-            response = requests.get(f"{API_URL}/api/agents")
+            response = session.get(f"{API_URL}/api/agents")
             print(f"List agents: {response.status_code} - Found {len(response.json()['agents'])} agents")
             
             # Get specific agent
-            response = requests.get(f"{API_URL}/api/agents/{agent_id}")
+            response = session.get(f"{API_URL}/api/agents/{agent_id}")
             print(f"Get agent: {response.status_code} - {response.json()['name']}")
             
             # Update agent
             update_data = {"description": "Updated test agent"}
-            response = requests.put(f"{API_URL}/api/agents/{agent_id}", json=update_data)
+            response = session.put(f"{API_URL}/api/agents/{agent_id}", json=update_data)
             print(f"Update agent: {response.status_code}")
             
             return agent_id
@@ -86,18 +89,18 @@ def test_delegation_management(agent_id):
             "scopes": ["read:data"]
         }
         
-        response = requests.post(f"{API_URL}/api/delegations", json=delegation_data)
+        response = session.post(f"{API_URL}/api/delegations", json=delegation_data)
         print(f"Create delegation: {response.status_code} - {response.json()}")
         
         if response.status_code == 201:
             delegation_id = response.json()['delegation']['id']
             
             # List delegations
-            response = requests.get(f"{API_URL}/api/delegations")
+            response = session.get(f"{API_URL}/api/delegations")
             print(f"List delegations: {response.status_code} - Found {len(response.json()['delegations'])} delegations")
             
             # Approve delegation
-            response = requests.put(f"{API_URL}/api/delegations/{delegation_id}/approve")
+            response = session.put(f"{API_URL}/api/delegations/{delegation_id}/approve")
             print(f"Approve delegation: {response.status_code}")
             
             return delegation_id
@@ -112,7 +115,7 @@ def test_token_management():
     
     try:
         # List active tokens
-        response = requests.get(f"{API_URL}/api/tokens/active")
+        response = session.get(f"{API_URL}/api/tokens/active")
         print(f"List active tokens: {response.status_code} - Found {len(response.json()['active_tokens'])} tokens")
         
     except requests.RequestException as e:
@@ -123,7 +126,7 @@ def test_demo_flow():
     print("\nTesting demo flow...")
     
     try:
-        response = requests.post(f"{API_URL}/api/demo/run")
+        response = session.post(f"{API_URL}/api/demo/run")
         print(f"Demo flow: {response.status_code}")
         
         if response.status_code == 200:
@@ -141,11 +144,11 @@ def test_simulation():
     
     try:
         # List scenarios
-        response = requests.get(f"{API_URL}/api/simulate/scenarios")
+        response = session.get(f"{API_URL}/api/simulate/scenarios")
         print(f"List scenarios: {response.status_code} - Found {len(response.json()['scenarios'])} scenarios")
         
         # Run happy path simulation
-        response = requests.post(f"{API_URL}/api/simulate/happy_path")
+        response = session.post(f"{API_URL}/api/simulate/happy_path")
         print(f"Happy path simulation: {response.status_code}")
         
     except requests.RequestException as e:
@@ -158,7 +161,13 @@ def main():
     
     # Wait for servers to be ready
     print("Waiting for servers to start...")
-    time.sleep(3)
+    try:
+        wait_listen(config.auth_server_host, config.auth_server_port)
+        wait_listen(config.resource_server_host, config.resource_server_port)
+        wait_listen("0.0.0.0", config.frontend_port)
+    except RuntimeError:
+        print("Servers did not start. Make sure all servers are running.")
+        return
     
     # Test health endpoints first
     if not test_health_endpoints():
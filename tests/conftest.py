@@ -1,43 +1,150 @@
 import os
 import sys
 import json
+import shutil
 import tempfile
 
-# Create a temporary agents file and set the environment variable BEFORE
-# importing the auth_server module so that it loads the correct file.
-temp_agents_file = tempfile.NamedTemporaryFile(mode="w+", delete=False)
-json.dump({"agent-client-id": {"name": "CalendarAgent"}}, temp_agents_file)
-temp_agents_file.close()
-os.environ["AGENTS_FILE"] = temp_agents_file.name
-
-# Temporary users file so tests can register and authenticate users
-temp_users_file = tempfile.NamedTemporaryFile(mode="w+", delete=False)
-json.dump({"alice": "password123"}, temp_users_file)
-temp_users_file.close()
-os.environ["USERS_FILE"] = temp_users_file.name
-
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import pytest
-import auth_server
-import resource_server
-from tests.utils import start_server
+import requests
+from requests.adapters import HTTPAdapter
+from tests.utils import (
+    InProcessHttp, generate_pkce_pair, orjson_response_hook, start_server
+)
+
+# Contents of the seed files; reset_state restores these in memory
+SEED_AGENTS = {"agent-client-id": {"name": "CalendarAgent"}}
+SEED_USERS = {"alice": "password123"}
+
+def pytest_configure(config):
+    # Runs once per process before any test module is imported, so config
+    # picks up these settings when auth_server and friends load it.
+    global data_dir
+    data_dir = tempfile.mkdtemp(prefix="adp-tests-")
+
+    # Temporary agents and users files so tests can register and authenticate
+    agents_file = os.path.join(data_dir, "agents.json")
+    with open(agents_file, "w") as f:
+        json.dump(SEED_AGENTS, f)
+    users_file = os.path.join(data_dir, "users.json")
+    with open(users_file, "w") as f:
+        json.dump(SEED_USERS, f)
 
-@pytest.fixture(scope='session', autouse=True)
+    os.environ["AGENTS_FILE"] = agents_file
+    os.environ["USERS_FILE"] = users_file
+    # Keep the files the servers write out of the checkout; each xdist
+    # worker runs this hook and so gets a directory of its own
+    os.environ["DELEGATIONS_FILE"] = os.path.join(data_dir, "delegations.json")
+    os.environ["TOKENS_FILE"] = os.path.join(data_dir, "tokens.json")
+    os.environ["ACTIVITIES_FILE"] = os.path.join(data_dir, "activities.jsonl")
+
+def _shared_storage():
+    """The global storage manager, or None if no test has created it yet."""
+    module = sys.modules.get("storage_manager")
+    return module._instance if module is not None else None
+
+def pytest_unconfigure(config):
+    # Save outstanding changes while the data directory still exists
+    storage = _shared_storage()
+    if storage is not None:
+        storage.close()
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+@pytest.fixture(scope='session')
 def servers():
-    # start auth and resource servers for tests
-    auth_srv = start_server(auth_server.app, port=5000)
-    res_srv = start_server(resource_server.app, port=6000)
-    yield
+    # Imported here so tests that never touch the servers skip the cost
+    import auth_server
+    import resource_server
+    from config import config
+    from run_servers import wait_listen
+
+    # Bind ephemeral ports so parallel xdist workers (or a dev server
+    # already on 5000/6000) never collide, then point the apps at them.
+    auth_srv = start_server(auth_server.app, port=0)
+    res_srv = start_server(resource_server.app, port=0)
+    config.auth_server_port = auth_srv.port
+    config.resource_server_port = res_srv.port
+    resource_server.INTROSPECT_URL = f"{config.auth_server_url}/introspect"
+    wait_listen("127.0.0.1", auth_srv.port)
+    wait_listen("127.0.0.1", res_srv.port)
+    yield auth_srv, res_srv
     res_srv.shutdown()
     auth_srv.shutdown()
-    os.remove(temp_agents_file.name)
-    os.remove(temp_users_file.name)
+
+@pytest.fixture(scope='session')
+def base_auth(servers):
+    auth_srv, _ = servers
+    return f'http://localhost:{auth_srv.port}'
+
+@pytest.fixture(scope='session')
+def base_rs(servers):
+    _, res_srv = servers
+    return f'http://localhost:{res_srv.port}'
+
+@pytest.fixture(scope='session')
+def http():
+    # Shared keep-alive session; safe to use from the perf tests' worker threads
+    session = requests.Session()
+    session.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=64))
+    session.hooks['response'].append(orjson_response_hook)
+    yield session
+    session.close()
+
+@pytest.fixture(scope='session')
+def wsgi_http(base_auth, base_rs):
+    # Same interface as http, without the socket. The resource server still
+    # introspects tokens over HTTP, so the servers are started regardless.
+    import auth_server
+    import resource_server
+    return InProcessHttp({base_auth: auth_server.app, base_rs: resource_server.app})
+
+@pytest.fixture(scope='session')
+def token_factory(wsgi_http, base_auth):
+    """Issue a fresh read:data access token for alice, optionally via PKCE."""
+    def issue(use_pkce=False):
+        params = {'user': 'alice', 'client_id': 'agent-client-id', 'scope': 'read:data'}
+        data = {}
+        if use_pkce:
+            verifier, challenge = generate_pkce_pair()
+            params.update(code_challenge=challenge, code_challenge_method='S256')
+            data['code_verifier'] = verifier
+        r = wsgi_http.get(f'{base_auth}/authorize', params=params)
+        data['delegation_token'] = r.json()['delegation_token']
+        r = wsgi_http.post(f'{base_auth}/token', data=data)
+        return r.json()['access_token']
+    return issue
+
+@pytest.fixture(scope='session')
+def auth_client():
+    # In-process client for tests that only talk to the auth server
+    import auth_server
+    return auth_server.app.test_client()
+
+@pytest.fixture(scope='session')
+def pkce_pair():
+    return generate_pkce_pair()
+
+@pytest.fixture(scope='session')
+def alice_read_token(http, base_auth):
+    # Shared by read-only tests. Clearing the token lists in reset_state
+    # does not invalidate an issued token, so no test needs to opt out.
+    r = http.get(f'{base_auth}/authorize', params={
+        'user': 'alice',
+        'client_id': 'agent-client-id',
+        'scope': 'read:data'
+    })
+    delegation_token = r.json()['delegation_token']
+    r = http.post(f'{base_auth}/token', data={'delegation_token': delegation_token})
+    access_token = r.json()['access_token']
+    return access_token, {'Authorization': f'Bearer {access_token}'}
 
 @pytest.fixture(autouse=True)
 def reset_state():
-    auth_server.ACTIVE_TOKENS.clear()
-    auth_server.REVOKED_TOKENS.clear()
-    # reload agents from persistent file to ensure isolation
-    auth_server.AGENTS = auth_server.load_agents()
-    auth_server.USERS = auth_server.load_users()
+    storage = _shared_storage()
+    if storage is None:
+        return
+    storage.reset(users=SEED_USERS)
+    for agent in storage.list_agents():
+        if agent.id not in SEED_AGENTS:
+            storage.delete_agent(agent.id)
@@ -1,17 +1,12 @@
-import requests
-
-BASE_URL = 'http://localhost:5000'
-
-
-def test_register_new_client():
-    resp = requests.post(f'{BASE_URL}/register', json={
+def test_register_new_client(auth_client):
+    resp = auth_client.post('/register', json={
         'client_id': 'test-agent',
         'name': 'TestAgent'
     })
     assert resp.status_code == 201
 
     # Newly registered agent should be authorized
-    r = requests.get(f'{BASE_URL}/authorize', params={
+    r = auth_client.get('/authorize', query_string={
         'user': 'alice',
         'client_id': 'test-agent',
         'scope': 'read:data'
@@ -19,16 +14,16 @@ def test_register_new_client():
     assert r.status_code == 200
 
 
-def test_register_duplicate_client_fails():
-    resp = requests.post(f'{BASE_URL}/register', json={
+def test_register_duplicate_client_fails(auth_client):
+    resp = auth_client.post('/register', json={
         'client_id': 'agent-client-id',
         'name': 'CalendarAgent'
     })
     assert resp.status_code == 400
 
 
-def test_authorize_unregistered_client_fails():
-    r = requests.get(f'{BASE_URL}/authorize', params={
+def test_authorize_unregistered_client_fails(auth_client):
+    r = auth_client.get('/authorize', query_string={
         'user': 'alice',
         'client_id': 'unknown-agent',
         'scope': 'read:data'
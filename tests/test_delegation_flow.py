@@ -1,10 +1,5 @@
-import requests
-
-BASE_AUTH = 'http://localhost:5000'
-BASE_RS = 'http://localhost:6000'
-
-def test_full_delegation_flow():
-    r = requests.get(f'{BASE_AUTH}/authorize', params={
+def test_full_delegation_flow(http, base_auth, base_rs):
+    r = http.get(f'{base_auth}/authorize', params={
         'user': 'alice',
         'client_id': 'agent-client-id',
         'scope': 'read:data'
@@ -12,12 +7,12 @@ def test_full_delegation_flow():
     assert r.status_code == 200
     delegation = r.json()['delegation_token']
 
-    r = requests.post(f'{BASE_AUTH}/token', data={'delegation_token': delegation})
+    r = http.post(f'{base_auth}/token', data={'delegation_token': delegation})
     assert r.status_code == 200
     access_token = r.json()['access_token']
 
     headers = {'Authorization': f'Bearer {access_token}'}
-    r = requests.get(f'{BASE_RS}/data', headers=headers)
+    r = http.get(f'{base_rs}/data', headers=headers)
     assert r.status_code == 200
     body = r.json()
     assert body['user'] == 'alice'
@@ -1,12 +1,13 @@
-import requests
 import demo_frontend
+from run_servers import wait_listen
 from tests.utils import start_server
 
 
-def test_frontend_demo():
-    server = start_server(demo_frontend.app, port=7000)
-    resp = requests.get('http://localhost:7000/')
-    run = requests.get('http://localhost:7000/run')
+def test_frontend_demo(http, servers):
+    server = start_server(demo_frontend.app, port=0)
+    wait_listen("127.0.0.1", server.port)
+    resp = http.get(f'http://localhost:{server.port}/')
+    run = http.get(f'http://localhost:{server.port}/run')
     server.shutdown()
     assert resp.status_code == 200
     assert 'Start Demo' in resp.text
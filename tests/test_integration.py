@@ -1,21 +1,44 @@
-import requests
 import threading
 import time
 import subprocess
 import sys
 import os
+from unittest import mock
 
-BASE_AUTH = 'http://localhost:5000'
-BASE_RS = 'http://localhost:6000'
+from werkzeug.test import Client
 
-def test_end_to_end_flow():
+
+def test_resource_server_health(http, base_rs):
+    """Test the resource server health check"""
+    r = http.get(f'{base_rs}/health')
+    assert r.status_code == 200
+    assert r.headers['Content-Type'] == 'application/json'
+    body = r.json()
+    assert body['status'] == 'healthy'
+    assert body['service'] == 'resource-server'
+    assert 'timestamp' in body
+
+def test_health_check_middleware_bypasses_flask():
+    """Test that /health is answered by the middleware without dispatching to Flask"""
+    from resource_server import HealthCheckMiddleware
+    wrapped = mock.Mock()
+    client = Client(HealthCheckMiddleware(wrapped, "resource-server"))
+    r = client.get('/health')
+    assert r.status_code == 200
+    assert r.get_json()['service'] == 'resource-server'
+    r = client.head('/health')
+    assert r.status_code == 200
+    assert r.data == b''
+    wrapped.assert_not_called()
+
+def test_end_to_end_flow(http, base_auth, base_rs):
     """Test complete end-to-end delegation flow"""
     # Step 1: Register a new agent
     agent_data = {
         'client_id': 'test-integration-agent',
         'name': 'Integration Test Agent'
     }
-    r = requests.post(f'{BASE_AUTH}/register', json=agent_data)
+    r = http.post(f'{base_auth}/register', json=agent_data)
     assert r.status_code == 201
     
     # Step 2: Register a new user
@@ -23,11 +46,11 @@ def test_end_to_end_flow():
         'username': 'testuser',
         'password': 'testpass123'
     }
-    r = requests.post(f'{BASE_AUTH}/register_user', json=user_data)
+    r = http.post(f'{base_auth}/register_user', json=user_data)
     assert r.status_code == 201
     
     # Step 3: Get delegation token
-    r = requests.get(f'{BASE_AUTH}/authorize', params={
+    r = http.get(f'{base_auth}/authorize', params={
         'user': 'testuser',
         'client_id': 'test-integration-agent',
         'scope': 'read:data write:data'
@@ -36,7 +59,7 @@ def test_end_to_end_flow():
     delegation_token = r.json()['delegation_token']
     
     # Step 4: Exchange for access token
-    r = requests.post(f'{BASE_AUTH}/token', data={
+    r = http.post(f'{base_auth}/token', data={
         'delegation_token': delegation_token
     })
     assert r.status_code == 200
@@ -44,7 +67,7 @@ def test_end_to_end_flow():
     
     # Step 5: Access protected resource
     headers = {'Authorization': f'Bearer {access_token}'}
-    r = requests.get(f'{BASE_RS}/data', headers=headers)
+    r = http.get(f'{base_rs}/data', headers=headers)
     assert r.status_code == 200
     data = r.json()
     assert data['user'] == 'testuser'
@@ -53,7 +76,7 @@ def test_end_to_end_flow():
     assert 'write:data' in data['scope']
     
     # Step 6: Test token introspection
-    r = requests.post(f'{BASE_AUTH}/introspect', data={'token': access_token})
+    r = http.post(f'{base_auth}/introspect', data={'token': access_token})
     assert r.status_code == 200
     introspect_data = r.json()
     assert introspect_data['active'] is True
@@ -61,14 +84,14 @@ def test_end_to_end_flow():
     assert introspect_data['actor'] == 'test-integration-agent'
     
     # Step 7: Revoke token
-    r = requests.post(f'{BASE_AUTH}/revoke', data={'token': access_token})
+    r = http.post(f'{base_auth}/revoke', data={'token': access_token})
     assert r.status_code == 200
     
     # Step 8: Verify token is revoked
-    r = requests.get(f'{BASE_RS}/data', headers=headers)
+    r = http.get(f'{base_rs}/data', headers=headers)
     assert r.status_code == 403
 
-def test_multiple_concurrent_agents():
+def test_multiple_concurrent_agents(http, base_auth, base_rs):
     """Test multiple agents accessing resources concurrently"""
     agents = []
     tokens = []
@@ -79,20 +102,20 @@ def test_multiple_concurrent_agents():
             'client_id': f'concurrent-agent-{i}',
             'name': f'Concurrent Agent {i}'
         }
-        r = requests.post(f'{BASE_AUTH}/register', json=agent_data)
+        r = http.post(f'{base_auth}/register', json=agent_data)
         assert r.status_code == 201
         agents.append(f'concurrent-agent-{i}')
     
     # Get tokens for all agents
     for agent_id in agents:
-        r = requests.get(f'{BASE_AUTH}/authorize', params={
+        r = http.get(f'{base_auth}/authorize', params={
             'user': 'alice',
             'client_id': agent_id,
             'scope': 'read:data'
         })
         delegation_token = r.json()['delegation_token']
         
-        r = requests.post(f'{BASE_AUTH}/token', data={
+        r = http.post(f'{base_auth}/token', data={
             'delegation_token': delegation_token
         })
         access_token = r.json()['access_token']
@@ -101,7 +124,7 @@ def test_multiple_concurrent_agents():
     # Test concurrent access
     def access_resource(token, results, index):
         headers = {'Authorization': f'Bearer {token}'}
-        r = requests.get(f'{BASE_RS}/data', headers=headers)
+        r = http.get(f'{base_rs}/data', headers=headers)
         results[index] = r.status_code == 200
     
     results = [False] * len(tokens)
@@ -118,24 +141,12 @@ def test_multiple_concurrent_agents():
     # All requests should succeed
     assert all(results)
 
-def test_scope_limitation():
+def test_scope_limitation(http, base_rs, alice_read_token):
     """Test that agents can only access resources within their scope"""
     # This test would be more meaningful with multiple resource endpoints
     # For now, we test that the scope is properly returned
-    r = requests.get(f'{BASE_AUTH}/authorize', params={
-        'user': 'alice',
-        'client_id': 'agent-client-id',
-        'scope': 'read:data'  # Limited scope
-    })
-    delegation_token = r.json()['delegation_token']
-    
-    r = requests.post(f'{BASE_AUTH}/token', data={
-        'delegation_token': delegation_token
-    })
-    access_token = r.json()['access_token']
-    
-    headers = {'Authorization': f'Bearer {access_token}'}
-    r = requests.get(f'{BASE_RS}/data', headers=headers)
+    _, headers = alice_read_token  # Limited to read:data
+    r = http.get(f'{base_rs}/data', headers=headers)
     assert r.status_code == 200
     data = r.json()
     
@@ -1,20 +1,12 @@
-import requests
-import hashlib
-import base64
-import secrets
+from tests.utils import generate_unique_pkce_pair
 
-BASE_AUTH = 'http://localhost:5000'
 
-def test_pkce_s256_flow():
+def test_pkce_s256_flow(auth_client, pkce_pair):
     """Test PKCE with S256 code challenge method"""
-    # Generate code verifier and challenge
-    code_verifier = base64.urlsafe_b64encode(secrets.token_bytes(32)).decode('utf-8').rstrip('=')
-    code_challenge = base64.urlsafe_b64encode(
-        hashlib.sha256(code_verifier.encode('utf-8')).digest()
-    ).decode('utf-8').rstrip('=')
+    code_verifier, code_challenge = pkce_pair
     
     # Get delegation token with PKCE
-    r = requests.get(f'{BASE_AUTH}/authorize', params={
+    r = auth_client.get('/authorize', query_string={
         'user': 'alice',
         'client_id': 'agent-client-id',
         'scope': 'read:data',
@@ -22,61 +14,57 @@ def test_pkce_s256_flow():
         'code_challenge_method': 'S256'
     })
     assert r.status_code == 200
-    delegation_token = r.json()['delegation_token']
+    delegation_token = r.get_json()['delegation_token']
     
     # Exchange with correct verifier
-    r = requests.post(f'{BASE_AUTH}/token', data={
+    r = auth_client.post('/token', data={
         'delegation_token': delegation_token,
         'code_verifier': code_verifier
     })
     assert r.status_code == 200
-    assert 'access_token' in r.json()
+    assert 'access_token' in r.get_json()
 
-def test_pkce_s256_wrong_verifier():
+def test_pkce_s256_wrong_verifier(auth_client, pkce_pair):
     """Test PKCE with wrong code verifier"""
-    # Generate code verifier and challenge
-    code_verifier = base64.urlsafe_b64encode(secrets.token_bytes(32)).decode('utf-8').rstrip('=')
-    code_challenge = base64.urlsafe_b64encode(
-        hashlib.sha256(code_verifier.encode('utf-8')).digest()
-    ).decode('utf-8').rstrip('=')
+    _, code_challenge = pkce_pair
     
     # Get delegation token with PKCE
-    r = requests.get(f'{BASE_AUTH}/authorize', params={
+    r = auth_client.get('/authorize', query_string={
         'user': 'alice',
         'client_id': 'agent-client-id',
         'scope': 'read:data',
         'code_challenge': code_challenge,
         'code_challenge_method': 'S256'
     })
-    delegation_token = r.json()['delegation_token']
+    delegation_token = r.get_json()['delegation_token']
     
     # Exchange with wrong verifier
-    wrong_verifier = base64.urlsafe_b64encode(secrets.token_bytes(32)).decode('utf-8').rstrip('=')
-    r = requests.post(f'{BASE_AUTH}/token', data={
+    wrong_verifier, _ = generate_unique_pkce_pair()
+    r = auth_client.post('/token', data={
         'delegation_token': delegation_token,
         'code_verifier': wrong_verifier
     })
     assert r.status_code == 403
     assert "invalid" in r.text.lower()
 
-def test_pkce_plain_flow():
+def test_pkce_plain_flow(auth_client):
     """Test PKCE with plain code challenge method"""
     code_verifier = "test-verifier-123"
     
     # Get delegation token with plain PKCE
-    r = requests.get(f'{BASE_AUTH}/authorize', params={
+    r = auth_client.get('/authorize', query_string={
         'user': 'alice',
         'client_id': 'agent-client-id',
         'scope': 'read:data',
         'code_challenge': code_verifier,
         'code_challenge_method': 'plain'
     })
-    delegation_token = r.json()['delegation_token']
+    delegation_token = r.get_json()['delegation_token']
     
     # Exchange with correct verifier
-    r = requests.post(f'{BASE_AUTH}/token', data={
+    r = auth_client.post('/token', data={
         'delegation_token': delegation_token,
         'code_verifier': code_verifier
     })
     assert r.status_code == 200
-    assert 'access_token' in r.json()
\ No newline at end of file
+    assert 'access_token' in r.get_json()
\ No newline at end of file
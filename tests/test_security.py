@@ -1,107 +1,119 @@
-import requests
 import jwt
 import time
 from datetime import datetime, timedelta
-import auth_server
+from unittest import mock
 
-BASE_AUTH = 'http://localhost:5000'
-BASE_RS = 'http://localhost:6000'
-JWT_SECRET = auth_server.JWT_SECRET
+from config import config
 
-def test_expired_delegation_token():
+JWT_SECRET = config.jwt_secret
+
+# Expired long ago, so it can be signed once at import
+EXPIRED_DELEGATION_TOKEN = jwt.encode({
+    "iss": "http://localhost:5000",
+    "sub": "agent-client-id",
+    "delegator": "alice",
+    "scope": ["read:data"],
+    "exp": datetime(2000, 1, 1),
+    "iat": datetime(2000, 1, 1),
+}, JWT_SECRET, algorithm="HS256")
+
+def test_expired_delegation_token(wsgi_http, base_auth):
     """Test that expired delegation tokens are rejected"""
-    # Create an expired delegation token
-    expired_delegation = {
-        "iss": "http://localhost:5000",
-        "sub": "agent-client-id",
-        "delegator": "alice",
-        "scope": ["read:data"],
-        "exp": datetime.utcnow() - timedelta(minutes=1),  # Expired
-        "iat": datetime.utcnow() - timedelta(minutes=2),
-    }
-    expired_token = jwt.encode(expired_delegation, JWT_SECRET, algorithm="HS256")
-    
-    r = requests.post(f'{BASE_AUTH}/token', data={'delegation_token': expired_token})
+    r = wsgi_http.post(f'{base_auth}/token', data={'delegation_token': EXPIRED_DELEGATION_TOKEN})
     assert r.status_code == 403
     assert "expired" in r.text.lower()
 
-def test_invalid_delegation_token():
+def test_invalid_delegation_token(wsgi_http, base_auth):
     """Test that invalid delegation tokens are rejected"""
-    r = requests.post(f'{BASE_AUTH}/token', data={'delegation_token': 'invalid-token'})
+    r = wsgi_http.post(f'{base_auth}/token', data={'delegation_token': 'invalid-token'})
     assert r.status_code == 403
     assert "invalid" in r.text.lower()
 
-def test_token_revocation():
-    """Test token revocation functionality"""
-    # Get valid tokens
-    r = requests.get(f'{BASE_AUTH}/authorize', params={
-        'user': 'alice',
-        'client_id': 'agent-client-id',
-        'scope': 'read:data'
-    })
-    delegation_token = r.json()['delegation_token']
-    
-    r = requests.post(f'{BASE_AUTH}/token', data={'delegation_token': delegation_token})
-    access_token = r.json()['access_token']
-    
-    # Verify token works
-    headers = {'Authorization': f'Bearer {access_token}'}
-    r = requests.get(f'{BASE_RS}/data', headers=headers)
-    assert r.status_code == 200
-    
-    # Revoke token
-    r = requests.post(f'{BASE_AUTH}/revoke', data={'token': access_token})
-    assert r.status_code == 200
-    
-    # Verify token no longer works
-    r = requests.get(f'{BASE_RS}/data', headers=headers)
+def test_forged_access_token_rejected(wsgi_http, base_auth, base_rs):
+    """Test that access tokens signed with the wrong key are rejected"""
+    forged_claims = {
+        "iss": base_auth,
+        "sub": "alice",
+        "actor": "agent-client-id",
+        "scope": ["read:data"],
+        "exp": datetime.utcnow() + timedelta(minutes=5),
+        "iat": datetime.utcnow(),
+    }
+    forged_token = jwt.encode(forged_claims, "not-the-real-signing-secret-0123456789", algorithm="HS256")
+
+    headers = {'Authorization': f'Bearer {forged_token}'}
+    r = wsgi_http.get(f'{base_rs}/data', headers=headers)
     assert r.status_code == 403
 
-def test_scope_enforcement():
+def test_resource_server_relies_on_introspection():
+    """Test that /data only grants access when introspection reports the token active"""
+    import resource_server
+    client = resource_server.app.test_client()
+    with mock.patch.object(resource_server.introspect_session, 'post') as post:
+        r = client.get('/data', headers={'Authorization': 'Basic abc'})
+        assert r.status_code == 401
+        post.assert_not_called()
+
+        post.return_value = mock.Mock(content=b'{"active": false}')
+        r = client.get('/data', headers={'Authorization': 'Bearer some-token'})
+        assert r.status_code == 403
+        post.assert_called_once()
+        assert post.call_args.kwargs['data'] == {"token": "some-token"}
+
+def test_unparseable_introspection_response_is_unavailable():
+    """Test that a non-JSON introspection body is treated as the auth server being unavailable"""
+    import resource_server
+    client = resource_server.app.test_client()
+    with mock.patch.object(resource_server.introspect_session, 'post') as post:
+        post.return_value = mock.Mock(content=b'<html>Bad Gateway</html>')
+        r = client.get('/data', headers={'Authorization': 'Bearer some-token'})
+    assert r.status_code == 503
+
+def test_scope_enforcement(wsgi_http, base_auth, base_rs):
     """Test that scope is properly enforced"""
-    r = requests.get(f'{BASE_AUTH}/authorize', params={
+    r = wsgi_http.get(f'{base_auth}/authorize', params={
         'user': 'alice',
         'client_id': 'agent-client-id',
         'scope': 'read:data write:data'
     })
     delegation_token = r.json()['delegation_token']
     
-    r = requests.post(f'{BASE_AUTH}/token', data={'delegation_token': delegation_token})
+    r = wsgi_http.post(f'{base_auth}/token', data={'delegation_token': delegation_token})
     access_token = r.json()['access_token']
     
     # Verify scope is included in response
     headers = {'Authorization': f'Bearer {access_token}'}
-    r = requests.get(f'{BASE_RS}/data', headers=headers)
+    r = wsgi_http.get(f'{base_rs}/data', headers=headers)
     assert r.status_code == 200
     data = r.json()
     assert 'read:data' in data['scope']
     assert 'write:data' in data['scope']
 
-def test_unauthorized_agent():
+def test_unauthorized_agent(wsgi_http, base_auth):
     """Test that unregistered agents are rejected"""
-    r = requests.get(f'{BASE_AUTH}/authorize', params={
+    r = wsgi_http.get(f'{base_auth}/authorize', params={
         'user': 'alice',
         'client_id': 'unregistered-agent',
         'scope': 'read:data'
     })
     assert r.status_code == 403
 
-def test_unauthorized_user():
+def test_unauthorized_user(wsgi_http, base_auth):
     """Test that unregistered users are rejected"""
-    r = requests.get(f'{BASE_AUTH}/authorize', params={
+    r = wsgi_http.get(f'{base_auth}/authorize', params={
         'user': 'unknown-user',
         'client_id': 'agent-client-id',
         'scope': 'read:data'
     })
     assert r.status_code == 403
 
-def test_missing_authorization_header():
+def test_missing_authorization_header(wsgi_http, base_rs):
     """Test that requests without authorization header are rejected"""
-    r = requests.get(f'{BASE_RS}/data')
+    r = wsgi_http.get(f'{base_rs}/data')
     assert r.status_code == 401
 
-def test_malformed_authorization_header():
+def test_malformed_authorization_header(wsgi_http, base_rs):
     """Test that malformed authorization headers are rejected"""
     headers = {'Authorization': 'InvalidFormat token'}
-    r = requests.get(f'{BASE_RS}/data', headers=headers)
+    r = wsgi_http.get(f'{base_rs}/data', headers=headers)
     assert r.status_code == 401
\ No newline at end of file
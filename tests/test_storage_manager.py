@@ -0,0 +1,473 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import threading
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+
+import storage_manager
+from config import config
+from data_models import Agent, TokenInfo
+from storage_manager import StorageManager
+
+DATA_FILES = {
+    'agents': 'agents.json',
+    'users': 'users.json',
+    'delegations': 'delegations.json',
+    'tokens': 'tokens.json',
+    'activities': 'activities.jsonl',
+}
+
+
+def data_file_env(directory):
+    """Environment pointing a subprocess's storage files into directory."""
+    return {f'{name.upper()}_FILE': os.path.join(directory, filename)
+            for name, filename in DATA_FILES.items()}
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """Storage manager backed by files in a scratch directory."""
+    monkeypatch.chdir(tmp_path)
+    for name, filename in DATA_FILES.items():
+        monkeypatch.setattr(config, f'{name}_file', str(tmp_path / filename))
+    manager = StorageManager()
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def reopen(storage):
+    """Close a manager and load a fresh one from its files; closed at teardown."""
+    opened = []
+
+    def _reopen(manager):
+        manager.close()
+        opened.append(StorageManager())
+        return opened[-1]
+
+    yield _reopen
+    for manager in opened:
+        manager.close()
+
+
+def _access_token(jti, minutes=5):
+    claims = {
+        "sub": "alice",
+        "actor": "agent-client-id",
+        "scope": ["read:data"],
+        "exp": datetime.utcnow() + timedelta(minutes=minutes),
+        "iat": datetime.utcnow(),
+        "jti": jti,
+    }
+    return jwt.encode(claims, config.jwt_secret, algorithm=config.jwt_algorithm)
+
+
+def test_activities_are_journaled_one_line_per_event(storage):
+    storage.create_user('bob', 'secret')
+    storage.create_user('carol', 'secret')
+    storage.flush()
+
+    lines = storage.activities_file.read_text().splitlines()
+    actions = [json.loads(line)['action'] for line in lines]
+    assert actions == ['user_created', 'user_created']
+
+
+def test_activities_reload_from_journal(storage, reopen):
+    storage.create_user('bob', 'secret')
+    reloaded = reopen(storage)
+    activities = reloaded.get_activities()
+    assert [a.action for a in activities] == ['user_created']
+    assert activities[0].user == 'bob'
+
+
+def test_legacy_activities_file_is_imported(storage, reopen):
+    storage.close()
+    storage.activities_file.unlink()
+    storage.activities_file.with_suffix('.json').write_text(json.dumps([
+        {'id': 'activity-1', 'timestamp': '2024-01-01T00:00:00', 'action': 'user_created', 'details': {}},
+    ]))
+
+    reloaded = reopen(storage)
+    assert [a.action for a in reloaded.get_activities()] == ['user_created']
+    reloaded.log_activity(action='agent_created', details={})
+    reloaded.flush()
+    lines = reloaded.activities_file.read_text().splitlines()
+    assert [json.loads(line)['action'] for line in lines] == ['user_created', 'agent_created']
+
+
+def test_activity_journal_rotates_when_too_large(storage, monkeypatch):
+    monkeypatch.setattr(storage_manager, 'ACTIVITY_LOG_MAX_BYTES', 1)
+    storage.create_user('bob', 'secret')
+    storage.flush()
+
+    rotated = storage.activities_file.with_name(storage.activities_file.name + '.old')
+    assert rotated.exists()
+    assert len(storage.activities_file.read_text().splitlines()) == 1
+
+
+def test_agents_delegations_and_tokens_persist_across_reload(storage, reopen):
+    storage.create_agent({'id': 'agent-a', 'name': 'Agent A', 'scopes': ['read:data']})
+    delegation = storage.create_delegation({
+        'agent_id': 'agent-a',
+        'user_id': 'alice',
+        'scopes': ['read:data'],
+    })
+    storage.revoke_token('some-token-value-to-revoke')
+
+    reloaded = reopen(storage)
+    assert reloaded.get_agent('agent-a').scopes == ['read:data']
+    assert reloaded.get_delegation(delegation.id).agent_name == 'Agent A'
+    assert [d.id for d in reloaded.list_delegations(agent_id_filter='agent-a')] == [delegation.id]
+    assert reloaded.is_token_revoked('some-token-value-to-revoke')
+    assert json.loads(reloaded.agents_file.read_text())['agent-a']['name'] == 'Agent A'
+
+
+def test_saves_are_coalesced_and_atomic(storage, monkeypatch):
+    storage.flush()
+    writes = []
+    original = storage_manager._write_atomic
+    monkeypatch.setattr(
+        storage_manager, '_write_atomic',
+        lambda path, payload: (writes.append(path.name), original(path, payload))
+    )
+
+    with storage._agents_lock:
+        for i in range(10):
+            storage.create_agent({'id': f'agent-{i}', 'name': f'Agent {i}'})
+    storage.flush()
+
+    assert writes.count(storage.agents_file.name) == 1
+    assert len(json.loads(storage.agents_file.read_text())) == 11
+    assert not list(storage.agents_file.parent.glob('*.tmp'))
+
+
+def test_deleting_agent_without_approved_delegations_skips_delegations_file(storage, monkeypatch):
+    storage.create_agent({'id': 'agent-a', 'name': 'Agent A'})
+    storage.flush()
+    writes = []
+    original = storage_manager._write_atomic
+    monkeypatch.setattr(
+        storage_manager, '_write_atomic',
+        lambda path, payload: (writes.append(path.name), original(path, payload))
+    )
+
+    storage.delete_agent('agent-a')
+    storage.flush()
+
+    assert writes == [storage.agents_file.name]
+
+
+def test_flush_writes_outside_the_domain_lock(storage, monkeypatch):
+    storage.flush()
+    unblocked = []
+    original = storage_manager._write_atomic
+
+    def probe(path):
+        if storage._agents_lock.acquire(timeout=1):
+            storage._agents_lock.release()
+            unblocked.append(path.name)
+
+    def write(path, payload):
+        # Another thread must be able to take the agents lock during the write
+        thread = threading.Thread(target=probe, args=(path,))
+        thread.start()
+        thread.join()
+        original(path, payload)
+
+    monkeypatch.setattr(storage_manager, '_write_atomic', write)
+    storage.create_agent({'id': 'agent-a', 'name': 'Agent A'})
+    storage.flush()
+
+    assert storage.agents_file.name in unblocked
+    assert 'agent-a' in json.loads(storage.agents_file.read_text())
+
+
+def test_token_analysis_is_cached_until_revocation(storage, monkeypatch):
+    calls = []
+    original = TokenInfo.from_token
+    monkeypatch.setattr(
+        TokenInfo, 'from_token',
+        classmethod(lambda cls, token, revoked: (calls.append(token), original(token, revoked))[1])
+    )
+    first, second = _access_token('a'), _access_token('b')
+    storage.add_active_token(first)
+    storage.add_active_token(second)
+
+    assert len(storage.get_active_tokens()) == 2
+    assert storage.get_system_stats().active_tokens == 2
+    assert len(calls) == 2
+
+    storage.revoke_token(first)
+    assert [t.token for t in storage.get_active_tokens()] == [second]
+    assert storage.get_system_stats().active_tokens == 1
+    assert len(calls) == 3
+
+
+def test_system_stats_track_status_transitions(storage):
+    storage.create_agent({'id': 'agent-a', 'name': 'Agent A'})
+    storage.create_agent({'id': 'agent-b', 'name': 'Agent B'})
+    storage.update_agent('agent-b', {'status': 'suspended'})
+    approved = storage.create_delegation({'agent_id': 'agent-a', 'user_id': 'alice', 'scopes': []})
+    denied = storage.create_delegation({'agent_id': 'agent-a', 'user_id': 'alice', 'scopes': []})
+    storage.create_delegation({'agent_id': 'agent-b', 'user_id': 'alice', 'scopes': []})
+    storage.approve_delegation(approved.id)
+    storage.deny_delegation(denied.id)
+
+    stats = storage.get_system_stats()
+    assert (stats.total_agents, stats.active_agents, stats.suspended_agents) == (3, 2, 1)
+    assert (stats.pending_delegations, stats.approved_delegations, stats.denied_delegations) == (1, 1, 1)
+
+    storage.delete_agent('agent-a')
+    stats = storage.get_system_stats()
+    assert (stats.total_agents, stats.active_agents) == (2, 1)
+    assert (stats.approved_delegations, stats.revoked_delegations) == (0, 1)
+
+
+def test_list_delegations_filters_use_indices(storage):
+    storage.create_agent({'id': 'agent-a', 'name': 'Agent A'})
+    storage.create_agent({'id': 'agent-b', 'name': 'Agent B'})
+    storage.create_user('bob', 'secret')
+    first = storage.create_delegation({'agent_id': 'agent-a', 'user_id': 'alice', 'scopes': []})
+    second = storage.create_delegation({'agent_id': 'agent-a', 'user_id': 'bob', 'scopes': []})
+    third = storage.create_delegation({'agent_id': 'agent-b', 'user_id': 'bob', 'scopes': []})
+    storage.approve_delegation(second.id)
+
+    def ids(**filters):
+        return {d.id for d in storage.list_delegations(**filters)}
+
+    assert ids() == {first.id, second.id, third.id}
+    assert ids(agent_id_filter='agent-a') == {first.id, second.id}
+    assert ids(user_id_filter='bob', status_filter='pending') == {third.id}
+    assert ids(agent_id_filter='agent-a', user_id_filter='bob', status_filter='approved') == {second.id}
+    assert ids(agent_id_filter='unknown') == set()
+
+    storage.revoke_delegation(second.id)
+    assert ids(status_filter='approved') == set()
+    assert ids(status_filter='revoked') == {second.id}
+
+
+def test_listings_are_newest_first(storage):
+    for i in range(3):
+        storage.create_agent({'id': f'agent-{i}', 'name': f'Agent {i}', 'description': 'Widget'})
+        storage.create_delegation({'agent_id': f'agent-{i}', 'user_id': 'alice', 'scopes': []})
+
+    agents = storage.list_agents(search='widget')
+    assert [a.id for a in agents] == ['agent-2', 'agent-1', 'agent-0']
+    delegations = storage.list_delegations()
+    assert [d.agent_id for d in delegations] == ['agent-2', 'agent-1', 'agent-0']
+
+
+def test_client_supplied_created_at_is_ignored(storage):
+    storage.create_agent({'id': 'agent-new', 'name': 'New', 'description': 'Widget'})
+    storage.create_agent({'id': 'agent-old', 'name': 'Old', 'description': 'Widget',
+                          'created_at': '2000-01-01T00:00:00'})
+    storage.update_agent('agent-new', {'created_at': '1999-01-01T00:00:00'})
+    storage.create_delegation({'agent_id': 'agent-new', 'user_id': 'alice', 'scopes': []})
+    storage.create_delegation({'agent_id': 'agent-old', 'user_id': 'alice', 'scopes': [],
+                               'created_at': '2000-01-01T00:00:00'})
+
+    assert [a.id for a in storage.list_agents(search='widget')] == ['agent-old', 'agent-new']
+    assert storage.get_agent('agent-old').created_at > '2000-01-02'
+    assert [d.agent_id for d in storage.list_delegations()] == ['agent-old', 'agent-new']
+
+def test_revocation_is_visible_immediately(storage):
+    storage.create_agent({'id': 'agent-a', 'name': 'Agent A'})
+    delegation = storage.create_delegation({'agent_id': 'agent-a', 'user_id': 'alice', 'scopes': []})
+    storage.approve_delegation(delegation.id)
+    with storage._delegations_lock:
+        storage._delegations[delegation.id].access_token = 'tok-delegated'
+
+    storage.revoke_token('tok-direct')
+    assert storage.is_token_revoked('tok-direct')
+    assert not storage.is_token_revoked('tok-delegated')
+
+    storage.revoke_delegation(delegation.id)
+    assert storage.is_token_revoked('tok-delegated')
+
+
+def test_active_tokens_are_bounded(storage, reopen, monkeypatch):
+    monkeypatch.setattr(storage_manager, 'MAX_ACTIVE_TOKENS', 3)
+    for i in range(5):
+        storage.add_active_token(f'tok-{i}')
+    storage.add_active_token('tok-4')
+
+    assert list(storage._active_tokens) == ['tok-2', 'tok-3', 'tok-4']
+    reopened = reopen(storage)
+    assert list(reopened._active_tokens) == ['tok-2', 'tok-3', 'tok-4']
+
+
+def test_large_files_are_read_via_mmap(storage, reopen, monkeypatch):
+    monkeypatch.setattr(storage_manager, 'MMAP_MIN_BYTES', 1)
+    storage.create_agent({'id': 'agent-a', 'name': 'Agent A'})
+    storage.create_user('bob', 'secret')
+
+    reopened = reopen(storage)
+    assert reopened.get_agent('agent-a').name == 'Agent A'
+    assert reopened.validate_user('bob', 'secret')
+
+
+def test_empty_storage_file_loads_as_empty(tmp_path):
+    path = tmp_path / 'empty.json'
+    path.write_bytes(b'')
+    assert storage_manager._read_json(path) == {}
+
+
+def test_agent_search_tracks_updates(storage):
+    storage.create_agent({'id': 'agent-a', 'name': 'Mail Sorter', 'description': 'Files email'})
+
+    assert [a.id for a in storage.list_agents(search='SORTER')] == ['agent-a']
+    assert [a.id for a in storage.list_agents(search='email')] == ['agent-a']
+
+    storage.update_agent('agent-a', {'name': 'Inbox Helper'})
+    assert storage.list_agents(search='sorter') == []
+    assert [a.id for a in storage.list_agents(search='inbox')] == ['agent-a']
+
+    storage.delete_agent('agent-a')
+    assert storage.list_agents(search='inbox') == []
+
+
+def test_noop_agent_update_is_not_saved(storage):
+    storage.create_agent({'id': 'agent-a', 'name': 'Agent A'})
+    storage.flush()
+    activity_count = len(storage.get_activities(limit=100))
+
+    storage.update_agent('agent-a', {'name': 'Agent A', 'unknown_field': 1})
+    assert not storage._dirty['agents']
+    assert len(storage.get_activities(limit=100)) == activity_count
+
+    # Hold the lock so the background flusher cannot clear the flag first
+    with storage._agents_lock:
+        storage.update_agent('agent-a', {'name': 'Agent B'})
+        assert storage._dirty['agents']
+    assert len(storage.get_activities(limit=100)) == activity_count + 1
+
+
+def test_activities_are_capped_in_memory(storage, reopen, monkeypatch):
+    monkeypatch.setattr(storage_manager, 'MAX_ACTIVITIES', 5)
+    storage = reopen(storage)
+    for i in range(8):
+        storage.log_activity(action=f"action-{i}", details={})
+
+    assert len(storage._system_activities) == 5
+    assert [a.action for a in storage.get_activities(limit=2)] == ['action-6', 'action-7']
+
+
+def test_models_use_slots():
+    agent = Agent(id='agent-a', name='Agent A')
+    with pytest.raises(AttributeError):
+        agent.unexpected = True
+
+
+def test_cleanup_expires_tokens_without_reparsing(storage, monkeypatch):
+    expired, live = _access_token('old', minutes=-1), _access_token('new')
+    for token in (expired, live, 'not-a-jwt'):
+        storage.add_active_token(token)
+
+    def fail(*args):
+        raise AssertionError("cleanup must not re-parse tokens")
+    monkeypatch.setattr(TokenInfo, 'from_token', classmethod(fail))
+    storage.cleanup_expired_tokens()
+
+    assert list(storage._active_tokens) == [live, 'not-a-jwt']
+    assert storage.get_activities(limit=1)[0].details == {"removed_count": 1}
+
+
+def test_activity_writer_keeps_order_and_stops_on_close(storage):
+    for i in range(250):
+        storage.log_activity(action=f"action-{i}", details={})
+    storage.flush()
+
+    lines = storage.activities_file.read_text().splitlines()
+    assert [json.loads(line)['action'] for line in lines] == [f"action-{i}" for i in range(250)]
+
+    storage.close()
+    assert not storage._activity_writer.is_alive()
+    storage.log_activity(action="after-close", details={})
+    storage.flush()
+    assert storage.get_activities(limit=1)[0].action == "after-close"
+
+
+
+def test_unstorable_values_are_rejected(storage):
+    huge = 2 ** 70
+    with pytest.raises(ValueError):
+        storage.create_agent({'id': 'agent-a', 'name': 'Agent A', 'metadata': {'big': huge}})
+    assert storage.get_agent('agent-a') is None
+
+    storage.create_agent({'id': 'agent-a', 'name': 'Agent A'})
+    with pytest.raises(ValueError):
+        storage.update_agent('agent-a', {'metadata': {'big': huge}})
+    with pytest.raises(ValueError):
+        storage.create_delegation({'agent_id': 'agent-a', 'user_id': 'alice', 'scopes': [], 'metadata': {'big': huge}})
+
+    storage.update_agent('agent-a', {'name': 'Agent B'})
+    storage.flush()
+    assert json.loads(storage.agents_file.read_text())['agent-a']['name'] == 'Agent B'
+
+
+def test_sigterm_flushes_pending_writes(tmp_path):
+    script = textwrap.dedent("""
+        import sys, time
+        import storage_manager
+        storage_manager.SAVE_COALESCE_SECONDS = 60
+        storage_manager.storage_manager.flush()
+        time.sleep(0.2)  # let the flusher finish any cycle started during load
+        storage_manager.exit_on_sigterm()
+        storage_manager.storage_manager.create_agent({'id': 'agent-late', 'name': 'Late'})
+        print('ready', flush=True)
+        time.sleep(30)
+    """)
+    env = dict(os.environ, **data_file_env(str(tmp_path)),
+               PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    proc = subprocess.Popen([sys.executable, '-c', script], cwd=tmp_path, env=env,
+                            stdout=subprocess.PIPE, text=True)
+    try:
+        assert proc.stdout.readline().strip() == 'ready'
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(timeout=10) == 0
+    finally:
+        proc.kill()
+
+    assert 'agent-late' in json.loads((tmp_path / 'agents.json').read_text())
+
+
+def test_validate_user(storage):
+    storage.create_user('bob', 'sécret')
+
+    assert storage.validate_user('bob', 'sécret')
+    assert not storage.validate_user('bob', 'secret')
+    assert not storage.validate_user('nobody', 'sécret')
+
+
+def test_reset_restores_users_and_forgets_tokens(storage):
+    storage.create_user('bob', 'secret')
+    token = _access_token('a')
+    storage.add_active_token(token)
+    storage.revoke_token(token)
+
+    storage.reset(users={'alice': 'password123'})
+
+    assert storage.list_users() == ['alice']
+    assert storage.get_active_tokens() == []
+    assert not storage.is_token_revoked(token)
+
+
+def test_global_manager_is_created_lazily(tmp_path):
+    script = textwrap.dedent("""
+        import os, storage_manager
+        assert storage_manager._instance is None
+        assert not os.path.exists('agents.json')
+        from storage_manager import storage_manager as manager
+        assert manager is storage_manager.get_storage_manager()
+        manager.flush()
+        assert os.path.exists('agents.json')
+    """)
+    env = dict(os.environ, **data_file_env(''),
+               PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    subprocess.run([sys.executable, '-c', script], cwd=tmp_path, env=env, check=True, timeout=30)
@@ -1,70 +1,68 @@
 import jwt
-import requests
-import auth_server
+from config import config
 
-JWT_SECRET = auth_server.JWT_SECRET
-BASE_URL = 'http://localhost:5000'
+JWT_SECRET = config.jwt_secret
 
-def test_authorize_returns_delegation_token():
-    resp = requests.get(f'{BASE_URL}/authorize', params={
+def test_authorize_returns_delegation_token(auth_client):
+    resp = auth_client.get('/authorize', query_string={
         'user': 'alice',
         'client_id': 'agent-client-id',
         'scope': 'read:data write:data'
     })
     assert resp.status_code == 200
-    token = resp.json()['delegation_token']
+    token = resp.get_json()['delegation_token']
     decoded = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
     assert decoded['sub'] == 'agent-client-id'
     assert decoded['delegator'] == 'alice'
 
 
-def test_token_exchange_returns_access_token():
+def test_token_exchange_returns_access_token(auth_client):
     # obtain delegation token first
-    r = requests.get(f'{BASE_URL}/authorize', params={
+    r = auth_client.get('/authorize', query_string={
         'user': 'alice',
         'client_id': 'agent-client-id',
         'scope': 'read:data'
     })
-    delegation_token = r.json()['delegation_token']
+    delegation_token = r.get_json()['delegation_token']
 
-    r = requests.post(f'{BASE_URL}/token', data={'delegation_token': delegation_token})
+    r = auth_client.post('/token', data={'delegation_token': delegation_token})
     assert r.status_code == 200
-    access_token = r.json()['access_token']
+    access_token = r.get_json()['access_token']
     decoded = jwt.decode(access_token, JWT_SECRET, algorithms=['HS256'])
     assert decoded['sub'] == 'alice'
     assert decoded['actor'] == 'agent-client-id'
 
 
-def test_token_exchange_missing_verifier():
-    r = requests.get(f'{BASE_URL}/authorize', params={
+def test_token_exchange_missing_verifier(auth_client):
+    r = auth_client.get('/authorize', query_string={
         'user': 'alice',
         'client_id': 'agent-client-id',
         'scope': 'read:data',
         'code_challenge': 'testchallenge',
         'code_challenge_method': 'plain'
     })
-    delegation_token = r.json()['delegation_token']
+    delegation_token = r.get_json()['delegation_token']
 
-    r = requests.post(f'{BASE_URL}/token', data={'delegation_token': delegation_token})
+    r = auth_client.post('/token', data={'delegation_token': delegation_token})
     assert r.status_code == 403
     assert r.text == 'Missing code verifier'
 
 
-def test_token_exchange_plain_verifier():
+def test_token_exchange_plain_verifier(auth_client):
     verifier = 'simple'
-    r = requests.get(f'{BASE_URL}/authorize', params={
+    r = auth_client.get('/authorize', query_string={
         'user': 'alice',
         'client_id': 'agent-client-id',
         'scope': 'read:data',
         'code_challenge': verifier,
         'code_challenge_method': 'plain'
     })
-    delegation_token = r.json()['delegation_token']
+    delegation_token = r.get_json()['delegation_token']
 
-    r = requests.post(f'{BASE_URL}/token', data={
+    r = auth_client.post('/token', data={
         'delegation_token': delegation_token,
         'code_verifier': verifier
     })
     assert r.status_code == 200
-    assert 'access_token' in r.json()
+    assert 'access_token' in r.get_json()
 
@@ -1,16 +1,11 @@
-import requests
-
-BASE_URL = 'http://localhost:5000'
-
-
-def test_register_new_user():
-    resp = requests.post(f'{BASE_URL}/register_user', json={
+def test_register_new_user(auth_client):
+    resp = auth_client.post('/register_user', json={
         'username': 'bob',
         'password': 'secret'
     })
     assert resp.status_code == 201
 
-    r = requests.get(f'{BASE_URL}/authorize', params={
+    r = auth_client.get('/authorize', query_string={
         'user': 'bob',
         'client_id': 'agent-client-id',
         'scope': 'read:data'
@@ -18,8 +13,8 @@ def test_register_new_user():
     assert r.status_code == 200
 
 
-def test_register_duplicate_user_fails():
-    resp = requests.post(f'{BASE_URL}/register_user', json={
+def test_register_duplicate_user_fails(auth_client):
+    resp = auth_client.post('/register_user', json={
         'username': 'alice',
         'password': 'password123'
     })
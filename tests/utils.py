@@ -1,11 +1,16 @@
+import base64
+import hashlib
+import itertools
+import secrets
 import threading
-import time
+
+import orjson
 from werkzeug.serving import make_server
 
 class ServerThread(threading.Thread):
     def __init__(self, app, host='localhost', port=0):
         super().__init__()
-        self.server = make_server(host, port, app)
+        self.server = make_server(host, port, app, threaded=True)
         self.port = self.server.server_port
         self.daemon = True
 
@@ -19,6 +24,60 @@ class ServerThread(threading.Thread):
 def start_server(app, port):
     server = ServerThread(app, port=port)
     server.start()
-    # Wait briefly for server to start
-    time.sleep(0.2)
+    # Pay Flask's first-request setup here rather than in the first test
+    app.test_client().get('/__warmup__')
     return server
+
+def orjson_response_hook(response, *args, **kwargs):
+    """requests response hook that decodes .json() bodies with orjson."""
+    response.json = lambda **_: orjson.loads(response.content)
+    return response
+
+class InProcessResponse:
+    """The parts of a requests.Response the tests use, over a Flask test response."""
+
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.content = response.data
+        self.text = response.get_data(as_text=True)
+
+    def json(self):
+        return orjson.loads(self.content)
+
+class InProcessHttp:
+    """requests-style client that dispatches URLs straight to WSGI apps.
+
+    ``apps`` maps a base URL such as ``http://localhost:5000`` to the Flask
+    app serving it, so tests keep building full URLs but skip the socket.
+    """
+
+    def __init__(self, apps):
+        self._clients = {base.rstrip('/'): app.test_client() for base, app in apps.items()}
+
+    def _route(self, url):
+        for base, client in self._clients.items():
+            if url.startswith(base):
+                return client, url[len(base):] or '/'
+        raise ValueError(f"No app mounted for {url}")
+
+    def get(self, url, params=None, headers=None):
+        client, path = self._route(url)
+        return InProcessResponse(client.get(path, query_string=params, headers=headers))
+
+    def post(self, url, data=None, json=None, headers=None):
+        client, path = self._route(url)
+        return InProcessResponse(client.post(path, data=data, json=json, headers=headers))
+
+def generate_unique_pkce_pair():
+    """Return a freshly drawn PKCE (code_verifier, S256 code_challenge) pair."""
+    code_verifier = base64.urlsafe_b64encode(secrets.token_bytes(32)).decode('utf-8').rstrip('=')
+    code_challenge = base64.urlsafe_b64encode(
+        hashlib.sha256(code_verifier.encode('utf-8')).digest()
+    ).decode('utf-8').rstrip('=')
+    return code_verifier, code_challenge
+
+# Most tests just need a valid pair, so hand out a small precomputed pool
+# round-robin; use generate_unique_pkce_pair when freshness matters.
+_PKCE_POOL = [generate_unique_pkce_pair() for _ in range(16)]
+generate_pkce_pair = itertools.cycle(_PKCE_POOL).__next__